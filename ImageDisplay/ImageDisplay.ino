@@ -28,7 +28,7 @@ struct __attribute__((packed)) ImgHeader {
   char     magic[4];   // "IMG0"
   uint16_t width;
   uint16_t height;
-  uint8_t  fmt;        // 1=JPEG, 2=RGB565
+  uint8_t  fmt;        // 1=JPEG, 2=RGB565, 3=RLE RGB565
   uint32_t length;
 };
 
@@ -36,7 +36,9 @@ struct __attribute__((packed)) ImgHeader {
 enum MetaType : uint8_t {
   META_FULL = 1,  // title/artist/duration
   META_POS  = 2,  // position only
-  META_VOL  = 3   // volume percent (0..100)
+  META_VOL  = 3,  // volume percent (0..100)
+  META_STATE = 4, // position_ms + playing flag + host timestamp
+  META_POWER = 5  // display power: 0=awake, 1=dim, 2=sleep
 };
 
 // META_FULL header (followed by title and artist UTF-8 bytes)
@@ -62,6 +64,22 @@ struct __attribute__((packed)) MetaVolHeader {
   uint8_t  volume;     // 0..100
 };
 
+// META_STATE header (position is interpolated locally with millis() while playing)
+struct __attribute__((packed)) MetaStateHeader {
+  char     magic[4];     // "META"
+  uint8_t  type;         // 4
+  uint32_t position_ms;  // milliseconds
+  uint8_t  playing;      // 0=paused, 1=playing
+  uint32_t host_ts_ms;   // host monotonic ms (wraps), used to drop stale states
+};
+
+// META_POWER header
+struct __attribute__((packed)) MetaPowerHeader {
+  char     magic[4];     // "META"
+  uint8_t  type;         // 5
+  uint8_t  level;        // 0=awake, 1=dim, 2=sleep (panel off)
+};
+
 // ===================== State =====================
 static String g_title = "";
 static String g_artist = "";
@@ -69,6 +87,23 @@ static uint32_t g_duration = 0;  // sec
 static uint32_t g_position = 0;  // sec
 static uint8_t  g_volume  = 0;   // 0..100
 
+// Local progress interpolation (META_STATE)
+static bool     g_playing = false;
+static uint32_t g_base_pos_ms = 0;   // position at g_base_millis
+static uint32_t g_base_millis = 0;   // millis() when the last state arrived
+static uint32_t g_last_host_ts = 0;
+static bool     g_have_host_ts = false;
+// States at most this far behind the last one are stale; anything further
+// back is a new host session (host rebooted, its monotonic clock restarted)
+static const int32_t STALE_WINDOW_MS = 10000;
+static const uint32_t TICK_MS = 250; // how often to re-check the interpolated position
+static uint32_t g_last_tick = 0;
+
+// Display power (META_POWER); the host dims/sleeps us when nothing plays
+static const uint8_t BRIGHT_AWAKE = 200;
+static const uint8_t BRIGHT_DIM   = 24;
+static uint8_t  g_power = 0;         // 0=awake, 1=dim, 2=sleep
+
 // Progress bar and volume sprites to prevent flicker
 M5Canvas barSpr(&M5.Display);
 M5Canvas volSpr(&M5.Display);
@@ -292,6 +327,60 @@ void redrawOverlay() {
 }
 
 // ===================== Packet handlers =====================
+// fmt 3: row-wise RLE of RGB565 pixels, decoded straight from Serial one row
+// at a time (no full-frame buffer). Packets never cross a row boundary:
+//   ctrl & 0x80 -> run:     (ctrl & 0x7F)+1 copies of the next 2-byte pixel
+//   otherwise   -> literal: ctrl+1 pixels follow (2 bytes each)
+bool drawRLE565(const ImgHeader& hdr, int drawX, int drawY) {
+  std::unique_ptr<uint16_t[]> row(new (std::nothrow) uint16_t[hdr.width]);
+  if (!row) return false;
+
+  uint32_t remaining = hdr.length;
+  bool ok = true;
+  M5.Display.startWrite();
+  for (int y = 0; y < hdr.height && ok; ++y) {
+    int x = 0;
+    while (x < hdr.width) {
+      uint8_t ctrl;
+      if (remaining < 1 || !readExact(&ctrl, 1)) { ok = false; break; }
+      remaining -= 1;
+
+      int n = (ctrl & 0x7F) + 1;
+      if (x + n > hdr.width) { ok = false; break; }
+
+      if (ctrl & 0x80) {
+        uint16_t px;
+        if (remaining < 2 || !readExact(reinterpret_cast<uint8_t*>(&px), 2)) { ok = false; break; }
+        remaining -= 2;
+        for (int i = 0; i < n; ++i) row[x + i] = px;
+      } else {
+        size_t nb = (size_t)n * 2;
+        if (remaining < nb || !readExact(reinterpret_cast<uint8_t*>(&row[x]), nb)) { ok = false; break; }
+        remaining -= nb;
+      }
+      x += n;
+    }
+    if (ok) M5.Display.pushImage(drawX, drawY + y, hdr.width, 1, row.get());
+  }
+  M5.Display.endWrite();
+  return ok && remaining == 0;
+}
+
+bool handleIMG0_rle(const ImgHeader& hdr) {
+  CoverLayout L = computeLayout();
+  M5.Display.fillRect(0, 0, M5.Display.width(), L.overlayY0, BLACK);
+  M5.Display.setClipRect(L.coverX, L.coverY, L.coverSide, L.coverSide);
+
+  int drawX = L.coverX + (L.coverSide - (int)hdr.width)  / 2;
+  int drawY = L.coverY + (L.coverSide - (int)hdr.height) / 2;
+  bool ok = drawRLE565(hdr, drawX, drawY);
+
+  M5.Display.clearClipRect();
+  drawVolumeColumn();
+  redrawOverlay();
+  return ok;
+}
+
 bool handleIMG0() {
   ImgHeader hdr;
   memcpy(hdr.magic, "IMG0", 4);
@@ -301,6 +390,8 @@ bool handleIMG0() {
     return false;
   }
 
+  if (hdr.fmt == 3) return handleIMG0_rle(hdr);
+
   uint8_t* buf = (uint8_t*)heap_caps_malloc(hdr.length, MALLOC_CAP_8BIT);
   if (!buf) {
     M5.Display.clear(BLACK);
@@ -361,6 +452,7 @@ bool handleMETA_full_streamFastPath(uint8_t already_type) {
   g_artist = String((const char*)abuf.get(), artist_len);
   g_duration = duration;
   if (g_position > g_duration) g_position = 0;
+  g_have_host_ts = false;  // new track (or new host session): accept the next state as-is
 
   redrawOverlay();
   return true;
@@ -396,6 +488,9 @@ bool handleMETA_pos_streamFastPath(uint8_t already_type) {
   if (!readExact(reinterpret_cast<uint8_t*>(&pos), 4)) return false;
   g_position = pos;
   if (g_duration && g_position > g_duration) g_position = g_duration;
+  // Re-anchor interpolation so POS and STATE can be mixed
+  g_base_pos_ms = g_position * 1000;
+  g_base_millis = millis();
   // Fast path UI update
   drawProgressRow();
   return true;
@@ -412,11 +507,69 @@ bool handleMETA_vol_streamFastPath(uint8_t already_type) {
   return true;
 }
 
+bool handleMETA_state_streamFastPath(uint8_t already_type) {
+  (void)already_type; // META_STATE
+  uint32_t pos_ms; uint8_t playing; uint32_t host_ts;
+  if (!readExact(reinterpret_cast<uint8_t*>(&pos_ms), 4)) return false;
+  if (!readExact(&playing, 1)) return false;
+  if (!readExact(reinterpret_cast<uint8_t*>(&host_ts), 4)) return false;
+
+  // Wrap-safe "older than last" check; drop late/out-of-order states, but
+  // not a clock that jumped far back (host restarted while we stayed powered)
+  if (g_have_host_ts) {
+    int32_t age = (int32_t)(host_ts - g_last_host_ts);
+    if (age < 0 && age > -STALE_WINDOW_MS) return true;
+  }
+  g_last_host_ts = host_ts;
+  g_have_host_ts = true;
+
+  g_playing = playing != 0;
+  g_base_pos_ms = pos_ms;
+  g_base_millis = millis();
+  g_position = pos_ms / 1000;
+  if (g_duration && g_position > g_duration) g_position = g_duration;
+  drawProgressRow();
+  return true;
+}
+
+bool handleMETA_power_streamFastPath(uint8_t already_type) {
+  (void)already_type; // META_POWER
+  uint8_t level;
+  if (!readExact(&level, 1)) return false;
+  if (level > 2) level = 2;
+  if (level == g_power) return true;
+  if (g_power == 2) M5.Display.wakeup();
+  if (level == 2) {
+    M5.Display.setBrightness(0);
+    M5.Display.sleep();
+  } else {
+    M5.Display.setBrightness(level == 1 ? BRIGHT_DIM : BRIGHT_AWAKE);
+  }
+  g_power = level;
+  return true;
+}
+
+// Advance g_position from the last state while playing; redraw only when the
+// displayed second changes.
+void tickProgress() {
+  if (!g_playing) return;
+  uint32_t now = millis();
+  if (now - g_last_tick < TICK_MS) return;
+  g_last_tick = now;
+
+  uint32_t pos = (g_base_pos_ms + (now - g_base_millis)) / 1000;
+  if (g_duration && pos > g_duration) pos = g_duration;
+  if (pos != g_position) {
+    g_position = pos;
+    drawProgressRow();
+  }
+}
+
 // ===================== Setup / Loop =====================
 void setup() {
   auto cfg = M5.config();
   M5.begin(cfg);
-  M5.Display.setBrightness(200);
+  M5.Display.setBrightness(BRIGHT_AWAKE);
   M5.Display.clear(BLACK);
   M5.Display.setTextDatum(middle_center);
   M5.Display.setFont(&fonts::Font2);
@@ -430,7 +583,11 @@ void setup() {
 }
 
 void loop() {
-  if (Serial.available() < 4) { delay(2); return; }
+  if (Serial.available() < 4) {
+    tickProgress();
+    delay(g_power == 2 ? 20 : 2);  // nothing to draw while asleep, poll serial slower
+    return;
+  }
 
   // Peek at magic
   uint8_t magic[4];
@@ -457,6 +614,14 @@ void loop() {
       // Read remaining 1 byte volume
       if (!handleMETA_vol_streamFastPath(type)) return;
 
+    } else if (type == META_STATE) {
+      // Read remaining 9 bytes position_ms/playing/timestamp
+      if (!handleMETA_state_streamFastPath(type)) return;
+
+    } else if (type == META_POWER) {
+      // Read remaining 1 byte level
+      if (!handleMETA_power_streamFastPath(type)) return;
+
     } else {
       // Unknown meta type -> resync (drop stream until next recognizable magic)
       // Do nothing; next loop will try to read next magic
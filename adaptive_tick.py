@@ -0,0 +1,71 @@
+import threading
+import time
+
+
+class AdaptiveTicker:
+    """
+    Sleep between loop passes: `fast` seconds while playing, otherwise
+    starting at `slow` and doubling on every quiet pass up to `max_interval`.
+    poke() (e.g. from a player listener) wakes the loop at once and resets
+    the back-off.
+
+    Wakeups, events and process CPU time are accounted to the mode that was
+    active, so stats() can show what each mode costs per hour.
+    """
+    def __init__(self, fast=0.25, slow=1.0, max_interval=60.0, factor=2.0):
+        self.fast = fast
+        self.slow = slow
+        self.max_interval = max_interval
+        self.factor = factor
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.mode = None
+        self.interval = slow
+        self.modes = {}  # mode -> counters
+        self._at = time.monotonic()
+        self._cpu_at = time.process_time()
+
+    def poke(self):
+        self.event.set()
+
+    def _account(self):
+        now, cpu = time.monotonic(), time.process_time()
+        if self.mode is not None:
+            m = self.modes.setdefault(self.mode, {"seconds": 0.0, "cpu_s": 0.0, "wakeups": 0, "events": 0})
+            m["seconds"] += now - self._at
+            m["cpu_s"] += cpu - self._cpu_at
+        self._at, self._cpu_at = now, cpu
+
+    def set_mode(self, mode):
+        """'playing' ticks fast; anything else backs off."""
+        with self.lock:
+            if mode == self.mode:
+                return
+            self._account()
+            self.mode = mode
+            self.interval = self.fast if mode == "playing" else self.slow
+
+    def wait(self, limit=None):
+        """Sleep one interval (at most `limit` s) or until poked; True if poked."""
+        timeout = self.interval if limit is None else max(0.0, min(self.interval, limit))
+        woke = self.event.wait(timeout)
+        self.event.clear()
+        with self.lock:
+            self._account()
+            m = self.modes.setdefault(self.mode, {"seconds": 0.0, "cpu_s": 0.0, "wakeups": 0, "events": 0})
+            m["wakeups"] += 1
+            m["events"] += woke
+            if self.mode != "playing":
+                self.interval = self.slow if woke else min(self.max_interval, self.interval * self.factor)
+        return woke
+
+    def stats(self):
+        """Per mode: time spent, wakeups, events, process CPU, and wakeups/CPU seconds per hour."""
+        with self.lock:
+            self._account()
+            out = {}
+            for mode, m in self.modes.items():
+                hours = m["seconds"] / 3600
+                out[mode] = dict(m, wakeups_per_hour=m["wakeups"] / hours if hours else 0.0,
+                                 cpu_s_per_hour=m["cpu_s"] / hours if hours else 0.0)
+            return {"mode": self.mode, "interval_s": self.interval, "modes": out}
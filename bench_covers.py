@@ -0,0 +1,87 @@
+"""
+Compare IMG0 cover formats (1=JPEG, 2=RGB565, 3=RLE RGB565) over a corpus.
+
+  python bench_covers.py covers/                 # directory of images
+  python bench_covers.py urls.txt                # one artUrl per line
+  python bench_covers.py covers/ --port /dev/ttyACM0
+
+For each cover and format it reports the payload size, host encode time, the
+wire time at --baud (10 bits per byte on the UART) and, with --port, the
+measured time to push the frame through the port (write + flush). Display
+time on the M5 itself isn't visible from the host; the total column is
+encode + wire.
+"""
+import argparse, time
+from pathlib import Path
+from PIL import Image
+import serial
+import send_cover
+
+FORMATS = {1: "jpeg", 2: "rgb565", 3: "rle565"}
+
+
+def load_corpus(src: str):
+    p = Path(src)
+    if p.is_dir():
+        for f in sorted(p.iterdir()):
+            if f.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp", ".bmp"):
+                yield f.name, Image.open(f).convert("RGB")
+    else:
+        for url in p.read_text().split():
+            yield url.rsplit("/", 1)[-1], send_cover.fetch_image(url)
+
+
+def encode(fitted: Image.Image, fmt: int, quality: int) -> bytes:
+    if fmt == 1:
+        return send_cover.encode_jpeg(fitted, quality)
+    if fmt == 2:
+        return send_cover.to_rgb565_bytes(fitted)
+    return send_cover.encode_rle565(fitted)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark IMG0 cover formats")
+    p.add_argument("corpus", help="Directory of images or a file of URLs")
+    p.add_argument("--w", type=int, default=320)
+    p.add_argument("--h", type=int, default=240)
+    p.add_argument("--quality", type=int, default=85)
+    p.add_argument("--baud", type=int, default=921600)
+    p.add_argument("--port", help="Also time real sends through this serial port")
+    args = p.parse_args()
+
+    ser = serial.Serial(args.port, baudrate=args.baud, timeout=5) if args.port else None
+    totals = {fmt: [0, 0.0, 0.0, 0.0] for fmt in FORMATS}  # bytes, encode, wire, sent
+    n = 0
+
+    print(f"{'cover':<32} {'fmt':<7} {'bytes':>8} {'enc ms':>8} {'wire ms':>8} {'sent ms':>8} {'total ms':>9}")
+    for name, img in load_corpus(args.corpus):
+        n += 1
+        fitted = send_cover.center_fit(img, args.w, args.h)
+        for fmt, label in FORMATS.items():
+            t0 = time.perf_counter()
+            payload = encode(fitted, fmt, args.quality)
+            enc = (time.perf_counter() - t0) * 1000
+            wire = len(payload) * 10 / args.baud * 1000
+            sent = 0.0
+            if ser is not None:
+                t0 = time.perf_counter()
+                send_cover.send_frame(ser, fmt, args.w, args.h, payload)
+                sent = (time.perf_counter() - t0) * 1000
+            t = totals[fmt]
+            t[0] += len(payload); t[1] += enc; t[2] += wire; t[3] += sent
+            print(f"{name[:32]:<32} {label:<7} {len(payload):>8} {enc:>8.1f} {wire:>8.1f} {sent:>8.1f} {enc + wire:>9.1f}")
+
+    if ser is not None:
+        ser.close()
+    if not n:
+        print("No covers found.")
+        return
+
+    print(f"\nMean over {n} covers:")
+    for fmt, label in FORMATS.items():
+        b, enc, wire, sent = (v / n for v in totals[fmt])
+        print(f"{'':<32} {label:<7} {b:>8.0f} {enc:>8.1f} {wire:>8.1f} {sent:>8.1f} {enc + wire:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
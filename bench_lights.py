@@ -0,0 +1,143 @@
+"""
+Scene-switch latency and request counts for light_controller, against the
+local fake bridge (fake_hue_bridge.py) so no real bridge is needed.
+
+  python bench_lights.py --latency 40 --jitter 15 --runs 10
+  python bench_lights.py --bridge-scenes      # recall scenes stored on the bridge
+  python bench_lights.py --check --latency 200  # regression: quick presses must end on the last one
+"""
+import argparse, statistics, sys, threading, time
+import light_controller
+from fake_hue_bridge import FakeHueBridge
+
+
+def run(label, fn, fake, runs, pause):
+    times, reqs, throttled = [], [], []
+    for _ in range(runs):
+        time.sleep(pause)
+        fake.reset_stats()
+        t0 = time.perf_counter()
+        fn()
+        light_controller.scheduler.wait_idle()
+        times.append((time.perf_counter() - t0) * 1000)
+        s = fake.stats()
+        reqs.append(s["requests"])
+        throttled.append(s["throttled"])
+    times.sort()
+    print(f"{label:<18} mean {statistics.mean(times):7.1f} ms  p50 {times[len(times) // 2]:7.1f}  "
+          f"max {times[-1]:7.1f}  requests {statistics.mean(reqs):4.1f}  throttled {statistics.mean(throttled):4.1f}")
+
+
+def mash(presses, gap):
+    """Press scene keys `presses` times `gap` s apart, like mashing Day/Night/Reading."""
+    names = list(light_controller.scenes)
+    threads = []
+    for i in range(presses):
+        t = threading.Thread(target=light_controller.set_scene, args=(names[i % len(names)],))
+        t.start()
+        threads.append(t)
+        time.sleep(gap)
+    for t in threads:
+        t.join()
+
+
+# Presses `gap` s apart and the lights' expected end state (None = all off)
+SEQUENCES = [
+    (["Day", "Night", "Off"], None),
+    (["Day", "Off"], None),
+    (["Off", "Day"], "Day"),
+    (["Night", "Off", "Reading"], "Reading"),
+]
+
+
+def press(name):
+    if name == "Off":
+        light_controller.lights_off()
+    else:
+        light_controller.set_scene(name)
+
+
+def check(fake, gap, max_call_s):
+    """Run each SEQUENCE; the bridge, the light cache and every call's duration must come out right."""
+    failures = 0
+    for names, expect in SEQUENCES:
+        light_controller.lights_off()
+        light_controller.scheduler.wait_idle()
+        durations = {}
+
+        def timed(i, name):
+            t0 = time.perf_counter()
+            press(name)
+            durations[i] = time.perf_counter() - t0
+
+        threads = []
+        for i, name in enumerate(names):
+            t = threading.Thread(target=timed, args=(i, name))
+            t.start()
+            threads.append(t)
+            time.sleep(gap)
+        for t in threads:
+            t.join()
+        light_controller.scheduler.wait_idle()
+
+        with fake.lock:
+            states = {int(lid): dict(l["state"]) for lid, l in fake.lights.items()}
+        if expect is None:
+            bridge_ok = not any(s["on"] for s in states.values())
+        else:
+            bridge_ok = all(light_controller.state_matches(states[lid], light_controller.light_state(expect, i))
+                            for i, lid in enumerate(light_controller.lights_id))
+        scene = light_controller.light_cache.current_scene()
+        cache_ok = scene == (expect or "Off")
+        slow = max(durations.values())
+        ok = bridge_ok and cache_ok and slow <= max_call_s
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'} {' -> '.join(names):<24} bridge {'ok' if bridge_ok else 'WRONG'}  "
+              f"cache {scene}  slowest call {slow:.2f} s")
+    return failures
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark set_scene / lights_off against a fake bridge")
+    p.add_argument("--latency", type=float, default=30.0, help="ms per request")
+    p.add_argument("--jitter", type=float, default=10.0)
+    p.add_argument("--runs", type=int, default=10)
+    p.add_argument("--sticky", type=float, default=0.0, help="Chance a light ignores hue/sat")
+    p.add_argument("--over-limit", choices=("delay", "error"), default="delay")
+    p.add_argument("--bridge-scenes", action="store_true", help="Use store_scenes() + group recall")
+    p.add_argument("--pause", type=float, default=1.0, help="Seconds between runs (lets rate limits refill)")
+    p.add_argument("--mash", type=int, default=6, help="Scene presses in the mashing run")
+    p.add_argument("--mash-gap", type=float, default=0.05, help="Seconds between mashed presses")
+    p.add_argument("--check", action="store_true", help="Only run the press-sequence regression checks")
+    p.add_argument("--check-gap", type=float, default=0.05, help="Seconds between presses in --check")
+    p.add_argument("--max-call", type=float, default=3.0, help="Slowest allowed call in --check, seconds")
+    args = p.parse_args()
+
+    with FakeHueBridge(latency_ms=args.latency, jitter_ms=args.jitter, lights=light_controller.lights_id,
+                       group_id=light_controller.GROUP_ID, sticky=args.sticky,
+                       over_limit=args.over_limit) as fake:
+        light_controller.hue = light_controller.HueClient(fake.address, username=fake.username)
+        light_controller.USE_BRIDGE_SCENES = args.bridge_scenes
+
+        fake.reset_stats()
+        t0 = time.perf_counter()
+        light_controller.hue.bridge()
+        if args.bridge_scenes:
+            light_controller.store_scenes()
+        print(f"{'connect':<18} {(time.perf_counter() - t0) * 1000:7.1f} ms  requests {fake.stats()['requests']}")
+
+        if args.check:
+            sys.exit(1 if check(fake, args.check_gap, args.max_call) else 0)
+
+        for name in light_controller.scenes:
+            run(f"set_scene {name}", lambda: light_controller.set_scene(name), fake, args.runs, args.pause)
+        run("lights_off", light_controller.lights_off, fake, args.runs, args.pause)
+        run(f"mash x{args.mash}", lambda: mash(args.mash, args.mash_gap), fake, args.runs, args.pause)
+
+        q = light_controller.scheduler.queue_stats()
+        print(f"scheduler: sent {q['sent']}  superseded {q['superseded']}  failed {q['failed']}  "
+              f"queue mean {q['queue_ms_mean']:.1f} ms  max {q['queue_ms_max']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
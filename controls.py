@@ -0,0 +1,309 @@
+from utils import execute
+import queue
+import re
+import select
+import shutil
+import subprocess
+import threading
+import time
+
+try:
+    import dbus
+except ImportError:
+    dbus = None
+
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
+
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+MPRIS_PLAYER = "org.mpris.MediaPlayer2.Player"
+
+
+class MediaControl:
+    """
+    Player actions over one session-bus connection (MPRIS) instead of a
+    playerctl process per press. Needs dbus-python; without it, or while the
+    player isn't on the bus, each action falls back to playerctl.
+    """
+    def __init__(self, player="spotify"):
+        self.player = player
+        self.lock = threading.Lock()
+        self.bus = None
+        self.iface = None
+        self.props = None
+        self.backend = "dbus" if dbus is not None else "playerctl"
+
+    def _proxy(self):
+        if self.iface is None:
+            if self.bus is None:
+                self.bus = dbus.SessionBus()
+            obj = self.bus.get_object(f"org.mpris.MediaPlayer2.{self.player}", MPRIS_PATH)
+            self.iface = dbus.Interface(obj, MPRIS_PLAYER)
+            self.props = dbus.Interface(obj, "org.freedesktop.DBus.Properties")
+        return self.iface
+
+    def _call(self, action, fallback):
+        if dbus is not None:
+            with self.lock:
+                try:
+                    action(self._proxy())
+                    return True
+                except Exception as e:
+                    # Player restarted / not running: reconnect on the next press
+                    print(f"[MediaControl] D-Bus call failed, using playerctl: {e}")
+                    self.iface = self.props = None
+        return execute(f"playerctl -p {self.player} {fallback}").returncode == 0
+
+    def next(self):
+        return self._call(lambda p: p.Next(), "next")
+
+    def previous(self):
+        return self._call(lambda p: p.Previous(), "previous")
+
+    def play_pause(self):
+        return self._call(lambda p: p.PlayPause(), "play-pause")
+
+    def seek(self, seconds):
+        """Relative seek; negative goes back."""
+        sign = "+" if seconds >= 0 else "-"
+        return self._call(lambda p: p.Seek(dbus.Int64(int(seconds * 1_000_000))),
+                          f"position {abs(seconds)}{sign}")
+
+    def set_loop(self, mode):
+        """mode: None / Playlist / Track"""
+        return self._call(lambda p: self.props.Set(MPRIS_PLAYER, "LoopStatus", mode), f"loop {mode}")
+
+
+class Mixer:
+    """
+    Master volume without an amixer process per press. Backends, best first:
+      alsa    pyalsaaudio talks to the mixer directly
+      amixer  one long-lived `amixer -s` reading sset commands from stdin,
+              under `stdbuf -oL` so each reply is flushed to the pipe
+      execute `amixer set ...` per call (the old path)
+    Every change returns the new volume (0-100) or None. amixer -s only
+    takes set/sset/cset, so without pyalsaaudio get() runs `amixer get`;
+    a mixer that only reads (session=False) doesn't start the session.
+    """
+    TIMEOUT = 1.0  # seconds to wait for an amixer -s reply before giving up on it
+
+    def __init__(self, control="Master", session=True):
+        self.control = control
+        self.lock = threading.Lock()
+        self.mixer = None
+        self.proc = None
+        self.lines = queue.Queue()
+        self.backend = "execute"
+        if alsaaudio is not None:
+            try:
+                self.mixer = alsaaudio.Mixer(control)
+                self.backend = "alsa"
+                return
+            except Exception as e:
+                print(f"[Mixer] ALSA mixer '{control}' unavailable: {e}")
+        if session:
+            self._start_amixer()
+
+    def _start_amixer(self):
+        if shutil.which("stdbuf") is None:
+            # amixer's stdout is block-buffered on a pipe; replies would never arrive
+            print("[Mixer] stdbuf not found, running amixer per call")
+            self.proc = None
+            self.backend = "execute"
+            return
+        try:
+            self.proc = subprocess.Popen(["stdbuf", "-oL", "amixer", "-s"], stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError as e:
+            print(f"[Mixer] amixer -s unavailable: {e}")
+            self.proc = None
+            self.backend = "execute"
+            return
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.proc, self.lines), daemon=True).start()
+        self.backend = "amixer"
+
+    @staticmethod
+    def _read(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)  # exited
+
+    def _reply(self):
+        """
+        Read the control block amixer -s prints after an sset. The block
+        lists its channels ("Playback channels: Front Left - Front Right");
+        it's complete once each channel's line has arrived.
+        """
+        channels, percents = None, {}
+        while channels is None or len(percents) < len(channels):
+            line = self.lines.get(timeout=self.TIMEOUT)
+            if line is None:
+                raise OSError("amixer exited")
+            line = line.strip()
+            if line.startswith("Playback channels:"):
+                channels = [c.strip() for c in line.split(":", 1)[1].split(" - ")]
+                continue
+            name, _, rest = line.partition(":")
+            m = re.search(r"\[(\d{1,3})%\]", rest)
+            if m and (channels is None or name in channels):
+                percents[name] = int(m.group(1))
+        return percents[channels[0]]
+
+    def _restart_amixer(self):
+        self.proc.kill()
+        self._start_amixer()
+
+    def _amixer(self, command, fallback):
+        """Run an sset through the session; `fallback` (amixer set ...) only if it never got there."""
+        with self.lock:
+            if self.backend == "amixer":
+                try:
+                    self.proc.stdin.write(command + "\n")
+                    self.proc.stdin.flush()
+                except OSError as e:
+                    print(f"[Mixer] amixer -s session failed, restarting: {e}")
+                    self._restart_amixer()
+                else:
+                    try:
+                        return self._reply()
+                    except (OSError, ValueError, queue.Empty) as e:
+                        # The change was probably applied; read the level instead of repeating it
+                        print(f"[Mixer] no reply from amixer -s, restarting: {e}")
+                        self._restart_amixer()
+                        return self.get()
+        return execute(fallback, True)
+
+    def _alsa_volume(self):
+        self.mixer.handleevents()  # pick up changes made elsewhere since the last read
+        return self.mixer.getvolume()[0]
+
+    def get(self):
+        if self.backend == "alsa":
+            with self.lock:
+                return self._alsa_volume()
+        return execute(f"amixer get {self.control}", True)
+
+    def set(self, percent):
+        percent = max(0, min(100, int(percent)))
+        if self.backend == "alsa":
+            with self.lock:
+                self.mixer.setvolume(percent)
+            return percent
+        return self._amixer(f"sset {self.control} {percent}%", f"amixer set {self.control} {percent}%")
+
+    def change(self, delta):
+        """Relative change in percent, e.g. +6 / -12."""
+        if self.backend == "alsa":
+            with self.lock:
+                percent = max(0, min(100, self._alsa_volume() + int(delta)))
+                self.mixer.setvolume(percent)
+            return percent
+        step = f"{abs(int(delta))}%{'+' if delta >= 0 else '-'}"
+        return self._amixer(f"sset {self.control} {step}", f"amixer set {self.control} {step}")
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.terminate()
+
+
+class VolumeMonitor:
+    """
+    Watches the mixer for changes from any source (deck keys, keyboard,
+    desktop, other apps) and tells listeners the settled volume. No polling:
+    events come from the ALSA poll descriptors (alsa backend) or one
+    `alsactl monitor` process. A burst of events within `debounce` seconds
+    is read once, and listeners only hear about values that differ from the
+    last one.
+    """
+    def __init__(self, mixer, debounce=0.15):
+        self.mixer = mixer
+        self.debounce = debounce
+        self.listeners = []
+        self.volume = None
+        self.cond = threading.Condition()
+        self.event_at = None  # monotonic time of the latest unread event
+        self.running = False
+        self.proc = None
+        self.stats = {"events": 0, "reads": 0, "changes": 0}
+
+    def add_listener(self, callback):
+        """callback(volume) is called from the monitor thread when the level changes."""
+        self.listeners.append(callback)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._poke()  # report the starting level once
+        threading.Thread(target=self._watch, daemon=True).start()
+        threading.Thread(target=self._settle, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        if self.proc is not None:
+            self.proc.terminate()
+        with self.cond:
+            self.cond.notify_all()
+
+    def _poke(self):
+        with self.cond:
+            self.event_at = time.monotonic()
+            self.stats["events"] += 1
+            self.cond.notify_all()
+
+    def _watch(self):
+        if self.mixer.backend == "alsa":
+            self._watch_alsa()
+        else:
+            self._watch_alsactl()
+
+    def _watch_alsa(self):
+        poller = select.poll()
+        for fd, mask in self.mixer.mixer.polldescriptors():
+            poller.register(fd, mask)
+        while self.running:
+            if poller.poll(1000):
+                with self.mixer.lock:
+                    self.mixer.mixer.handleevents()
+                self._poke()
+
+    def _watch_alsactl(self):
+        while self.running:
+            try:
+                self.proc = subprocess.Popen(["alsactl", "monitor"], stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, text=True, bufsize=1)
+                for line in self.proc.stdout:
+                    if self.mixer.control in line:
+                        self._poke()
+            except Exception as e:
+                print(f"[VolumeMonitor] alsactl monitor failed: {e}")
+            if self.running:
+                time.sleep(5)  # alsactl exited (not installed / sound server restart), retry
+
+    def _settle(self):
+        while self.running:
+            with self.cond:
+                while self.running and self.event_at is None:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                # Wait for the burst to go quiet
+                quiet = time.monotonic() - self.event_at
+                if quiet < self.debounce:
+                    self.cond.wait(self.debounce - quiet)
+                    continue
+                self.event_at = None
+            volume = self.mixer.get()
+            self.stats["reads"] += 1
+            if volume is None or volume == self.volume:
+                continue
+            self.volume = volume
+            self.stats["changes"] += 1
+            for cb in self.listeners:
+                try:
+                    cb(volume)
+                except Exception as e:
+                    print(f"[VolumeMonitor] listener failed: {e}")
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class CoverCache:
+    """
+    Encoded cover payloads (the exact bytes that go after the IMG0 header),
+    keyed by art URL + target size + format + quality.
+
+    Two tiers:
+      - memory: the last `hot_items` payloads, no disk access at all
+      - disk:   one file per payload under `directory`, LRU by mtime,
+                trimmed to `max_bytes`
+    """
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, hot_items=16):
+        self.dir = Path(directory).expanduser()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hot_items = hot_items
+        self.lock = threading.Lock()
+        self.hot = OrderedDict()    # key -> payload
+        self.index = OrderedDict()  # key -> size on disk, oldest first
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    def _load_index(self):
+        files = []
+        for p in self.dir.glob("*.bin"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, p.stem, st.st_size))
+        for _, key, size in sorted(files):
+            self.index[key] = size
+            self.total += size
+        self._evict()
+
+    @staticmethod
+    def key(url: str, target, fmt: int, quality=None) -> str:
+        raw = f"{url}|{target[0]}x{target[1]}|{fmt}|{quality}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.bin"
+
+    def _remember(self, key: str, payload: bytes):
+        self.hot[key] = payload
+        self.hot.move_to_end(key)
+        while len(self.hot) > self.hot_items:
+            self.hot.popitem(last=False)
+
+    def get(self, url: str, target, fmt: int, quality=None):
+        key = self.key(url, target, fmt, quality)
+        with self.lock:
+            if key in self.hot:
+                self.hot.move_to_end(key)
+                if key in self.index:
+                    self.index.move_to_end(key)
+                self.hits += 1
+                return self.hot[key]
+            if key not in self.index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                payload = path.read_bytes()
+                os.utime(path)  # bump LRU position across restarts
+            except OSError:
+                self.total -= self.index.pop(key)
+                self.misses += 1
+                return None
+            self.index.move_to_end(key)
+            self._remember(key, payload)
+            self.hits += 1
+            return payload
+
+    def put(self, url: str, target, fmt: int, quality, payload: bytes):
+        key = self.key(url, target, fmt, quality)
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with self.lock:
+            try:
+                tmp.write_bytes(payload)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"[CoverCache] Failed to write {path}: {e}")
+            else:
+                self.total -= self.index.pop(key, 0)
+                self.index[key] = len(payload)
+                self.total += len(payload)
+                self._evict()
+            self._remember(key, payload)
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.index:
+            key, size = self.index.popitem(last=False)
+            self.total -= size
+            self.hot.pop(key, None)
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Bump when DeckLayer._render_image changes so old renders are rebuilt.
+RENDER_VERSION = 1
+
+
+class DeckAssetCache:
+    """
+    Native-format icon renders for one deck model, kept on disk so a restart
+    doesn't redo any Pillow work.
+
+    Layout under `directory`:
+      <model>/index.json          realpath -> [mtime_ns, size, sha1]
+      <model>/<sha1>_<0|1>.bin    native image, enabled (0) / disabled (1)
+
+    Files are content-addressed, so renaming or touching an asset without
+    changing it only costs a re-hash, not a re-render.
+    """
+    def __init__(self, directory, deck):
+        fmt = deck.key_image_format()
+        w, h = fmt["size"]
+        flip = "".join("1" if f else "0" for f in (fmt["flip"] or (False, False)))
+        model = f"{deck.deck_type()}_{w}x{h}_{fmt['format']}_r{fmt['rotation']}_f{flip}_v{RENDER_VERSION}"
+        self.dir = Path(directory).expanduser() / model.replace(" ", "_")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / "index.json"
+        self.index = {}
+        self.images = {}  # (realpath, disabled) -> (mtime_ns, native image)
+        try:
+            self.index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def _sha1(path):
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _digest(self, path, st):
+        entry = self.index.get(path)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        digest = self._sha1(path)
+        self.index[path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def _blob(self, digest, disabled):
+        return self.dir / f"{digest}_{1 if disabled else 0}.bin"
+
+    def precompile(self, asset_dir, render, pattern="*.jpg"):
+        """
+        Load every asset's renders into memory, calling render(path, disabled)
+        only for assets that aren't on disk yet. Returns (loaded, rendered).
+        """
+        loaded = rendered = 0
+        for p in sorted(Path(asset_dir).glob(pattern)):
+            path = os.path.realpath(p)
+            try:
+                st = os.stat(path)
+                digest = self._digest(path, st)
+            except OSError as e:
+                print(f"[DeckAssetCache] Skipping '{p}': {e}")
+                continue
+            for disabled in (False, True):
+                blob = self._blob(digest, disabled)
+                try:
+                    image = blob.read_bytes()
+                    loaded += 1
+                except OSError:
+                    image = render(str(p), disabled)
+                    self._write(blob, image)
+                    rendered += 1
+                self.images[(path, disabled)] = (st.st_mtime_ns, image)
+        self._save_index()
+        return loaded, rendered
+
+    def get(self, image_path, mtime_ns, disabled):
+        """Precompiled render for this asset, or None if missing/stale."""
+        entry = self.images.get((os.path.realpath(image_path), disabled))
+        if entry is None or entry[0] != mtime_ns:
+            return None
+        return entry[1]
+
+    def put(self, image_path, disabled, image):
+        """Store a fresh render (e.g. after an asset changed at runtime)."""
+        path = os.path.realpath(image_path)
+        try:
+            st = os.stat(path)
+            digest = self._digest(path, st)
+        except OSError:
+            return
+        self._write(self._blob(digest, disabled), image)
+        self.images[(path, disabled)] = (st.st_mtime_ns, image)
+        self._save_index()
+
+    def _write(self, blob, image):
+        tmp = blob.with_suffix(".tmp")
+        try:
+            tmp.write_bytes(bytes(image))
+            os.replace(tmp, blob)
+        except OSError as e:
+            print(f"[DeckAssetCache] Failed to write {blob}: {e}")
+
+    def _save_index(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(self.index))
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            print(f"[DeckAssetCache] Failed to write {self.index_path}: {e}")
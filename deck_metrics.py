@@ -0,0 +1,71 @@
+import threading
+from bisect import bisect_left
+
+# Upper bucket bounds in ms; the last bucket catches everything slower.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """Fixed-size latency histogram: bucket counts plus count/sum/max."""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (max for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        target = p / 100 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["inf"], self.counts)),
+        }
+
+
+class DeckMetrics:
+    """
+    Per-key histograms for DeckLayer, grouped by metric name:
+      press_to_done  key press -> callback finished
+      make_image     time in _make_image (cache hits included)
+      lock_wait      waiting for deck_lock before pushing images
+      set_key_image  one USB set_key_image call
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hists = {}  # name -> {key: Histogram}
+
+    def record(self, name, key, ms):
+        with self.lock:
+            per_key = self.hists.setdefault(name, {})
+            h = per_key.get(key)
+            if h is None:
+                h = per_key[key] = Histogram()
+            h.add(ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: {str(k): h.to_dict() for k, h in sorted(per_key.items(), key=lambda kv: str(kv[0]))}
+                    for name, per_key in self.hists.items()}
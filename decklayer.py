@@ -1,31 +1,107 @@
 from PIL import Image, ImageDraw, ImageFont
 from StreamDeck.ImageHelpers import PILHelper
+from StreamDeck.Transport.Transport import TransportError
+from collections import OrderedDict
+from deck_assets import DeckAssetCache
+from key_dispatcher import KeyDispatcher
+from deck_metrics import DeckMetrics
+from utils import write_json
 import threading
 import time
+import os
 
 class DeckLayer:
-    def __init__(self, deck, rows, cols):
+    def __init__(self, deck, rows, cols, image_cache_size=64):
         self.rows = rows
         self.cols = cols
         self.deck = deck
-        self.deck.open()
-        self.deck.reset()
-        self.deck.set_brightness(50)
+        self._open_deck()
 
         self.font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 14)
         self.pages = []
+        self.page_grids = []  # flattened/padded grid per page, built in add_page
         self.current_page = 0
         self.grid = []
-        self.key_callbacks = {}
+        self.key_callbacks = {}  # key index -> (key dict, callback), replaced whole on page switch
         self.running = True
         self.deck_lock = threading.Lock()
+        self.update_lock = threading.RLock()  # renders can come from the store's thread too
+
+        # Rendered native-format key images:
+        #   (image path, text, disabled, key size) -> (asset mtime, image)
+        self.image_cache = OrderedDict()
+        self.image_cache_size = image_cache_size
+        self.key_size = self.deck.key_image_format()["size"]
+
+        # Last image pushed to each key; unchanged keys aren't sent again
+        self.pushed = {}
+
+        # Persistent icon renders, set up by precompile()
+        self.asset_cache = None
+
+        # Timing histograms, see metrics_snapshot()
+        self.metrics = DeckMetrics()
+
+        # Callbacks run off the StreamDeck reader thread, serialized per key
+        self.dispatcher = KeyDispatcher(
+            on_done=lambda key, ms: self.metrics.record("press_to_done", key, ms))
+
+        # Page switch timings (ms), see page_switch_stats()
+        self.switch_times = []
+
+        # attach() timings (ms): re-open after a replug + full repaint
+        self.attach_times = []
+
+        # Called after a failed push (deck unplugged), e.g. DeviceSupervisor.poke
+        self.on_lost = None
 
+    def _open_deck(self):
+        self.deck.open()
+        self.deck.reset()
+        self.deck.set_brightness(50)
         self.deck.set_key_callback(self._key_change)
 
+    def connected(self):
+        """False once the deck has been unplugged (or reset off the bus)."""
+        try:
+            return self.deck.connected()
+        except Exception:
+            return False
+
+    def attach(self, deck):
+        """
+        Take over a re-plugged deck: open it and push every key of the
+        current page from the render cache. Pages, callbacks and caches are
+        kept, so this costs one repaint rather than a cold start.
+        """
+        start = time.perf_counter()
+        with self.deck_lock:
+            try:
+                self.deck.close()  # old handle, its reader thread is already dead
+            except Exception:
+                pass
+            self.deck = deck
+            self._open_deck()
+            self.pushed.clear()
+            if self.deck.key_image_format()["size"] != self.key_size:
+                # Different model: renders are keyed by size, but the asset cache is per model
+                self.key_size = self.deck.key_image_format()["size"]
+                self.asset_cache = None
+        self.update_all_states()
+        ms = (time.perf_counter() - start) * 1000
+        self.attach_times.append(ms)
+        del self.attach_times[:-100]
+        return ms
+
     def _key_change(self, deck, key, state):
-        if state and key in self.key_callbacks:
-            if self._is_enabled(self.grid[key]):
-                self.key_callbacks[key]()  # Only call if enabled
+        # Runs on the deck's reader thread: one lookup, so a press during a
+        # page switch sees either the old page or the new one, never a mix
+        entry = self.key_callbacks.get(key) if state else None
+        if entry is not None:
+            key_dict, callback = entry
+            if self._is_enabled(key_dict):
+                # Only call if enabled; "coalesce": fn(n) merges queued repeat presses
+                self.dispatcher.submit(key, callback, key_dict.get("coalesce"))
 
     def _is_enabled(self, key_dict):
         enabled = key_dict.get("enabled", True)
@@ -40,6 +116,32 @@ class DeckLayer:
                 print(f"[DeckLayer] Failed to evaluate image lambda: {e}")
                 image_path = None
 
+        mtime = None
+        if image_path:
+            try:
+                mtime = os.stat(image_path).st_mtime_ns
+            except OSError:
+                mtime = None
+        cache_key = (image_path, text, disabled, self.key_size)
+        cached = self.image_cache.get(cache_key)
+        if cached is not None and cached[0] == mtime:
+            self.image_cache.move_to_end(cache_key)
+            return cached[1]
+
+        native = None
+        if self.asset_cache is not None and mtime is not None:
+            native = self.asset_cache.get(image_path, mtime, disabled)
+        if native is None:
+            native = self._render_image(text, image_path, disabled)
+            if self.asset_cache is not None and mtime is not None:
+                self.asset_cache.put(image_path, disabled, native)
+        self.image_cache[cache_key] = (mtime, native)
+        self.image_cache.move_to_end(cache_key)
+        while len(self.image_cache) > self.image_cache_size:
+            self.image_cache.popitem(last=False)
+        return native
+
+    def _render_image(self, text, image_path, disabled):
         # Create base image and drawing context
         image = PILHelper.create_image(self.deck)
         draw = ImageDraw.Draw(image)
@@ -64,6 +166,18 @@ class DeckLayer:
         return PILHelper.to_native_format(self.deck, image)
 
 
+    def precompile(self, asset_dir, cache_dir):
+        """
+        Render every icon in asset_dir (enabled + disabled) for this deck, reusing
+        what's already on disk under cache_dir. Call before set_page().
+        """
+        start = time.perf_counter()
+        self.asset_cache = DeckAssetCache(cache_dir, self.deck)
+        loaded, rendered = self.asset_cache.precompile(
+            asset_dir, lambda path, disabled: self._render_image("", path, disabled))
+        print(f"[DeckLayer] Assets ready: {loaded} cached, {rendered} rendered "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
     def update_key(self, i, text=None, image_path=None):
         if i >= len(self.grid):
             return
@@ -72,52 +186,155 @@ class DeckLayer:
             key['text'] = text
         if image_path is not None:
             key['image'] = image_path
+        with self.update_lock:
+            self._push([(i, self._key_image(key, i))])
+
+    def update_all_states(self):
+        with self.update_lock:
+            self._push([(i, self._key_image(key, i)) for i, key in enumerate(self.grid)])
+
+    def bind(self, store):
+        """
+        Re-render keys when the StateStore fields they list in "depends"
+        change, instead of polling update_all_states().
+        """
+        store.subscribe(self._on_state)
+
+    def _on_state(self, changed):
+        with self.update_lock:
+            self._push([(i, self._key_image(key, i)) for i, key in enumerate(self.grid)
+                        if changed & set(key.get("depends", ()))])
+
+    def _key_image(self, key, i=None):
         disabled = not self._is_enabled(key)
-        image = self._make_image(key.get('text', ''), key.get('image'), disabled)
+        start = time.perf_counter()
+        image = self._make_image(key.get('text', ''), key.get('image'), disabled=disabled)
+        if i is not None:
+            self.metrics.record("make_image", i, (time.perf_counter() - start) * 1000)
+        return image
+
+    def _push(self, images):
+        """
+        Send only keys whose image differs from what's on the panel, under one
+        lock. Returns how many were sent; keys that failed (deck gone) stay
+        out of `pushed` so attach() or the next update sends them.
+        """
+        changed = [(i, img) for i, img in images if self.pushed.get(i) != img]
+        if not changed:
+            return 0
+        sent = 0
+        wait_start = time.perf_counter()
         with self.deck_lock:
-            self.deck.set_key_image(i, image)
+            t = time.perf_counter()
+            self.metrics.record("lock_wait", "all", (t - wait_start) * 1000)
+            for i, img in changed:
+                try:
+                    self.deck.set_key_image(i, img)
+                except TransportError as e:
+                    error = e
+                    break  # the rest would fail the same way
+                self.pushed[i] = img
+                sent += 1
+                now = time.perf_counter()
+                self.metrics.record("set_key_image", i, (now - t) * 1000)
+                t = now
+        if sent < len(changed):
+            print(f"[DeckLayer] {len(changed) - sent} key(s) not sent, deck unavailable: {error}")
+            if self.on_lost is not None:
+                self.on_lost()
+        return sent
 
-    def update_all_states(self):
-        for i, key in enumerate(self.grid):
-            disabled = not self._is_enabled(key)
-            image = self._make_image(key.get('text', ''), key.get('image'), disabled=disabled)
-            with self.deck_lock:
-                self.deck.set_key_image(i, image)
+    def metrics_snapshot(self):
+        """Per-key histograms (press_to_done, make_image, lock_wait, set_key_image) plus dispatcher counters."""
+        snap = self.metrics.snapshot()
+        snap["dispatcher"] = self.dispatcher.stats()
+        snap["page_switch"] = self.page_switch_stats()
+        snap["attach_ms"] = list(self.attach_times)
+        return snap
+
+    def start_metrics_dump(self, path, interval=60):
+        """Write metrics_snapshot() as JSON to `path` every `interval` seconds."""
+        def loop():
+            while self.running:
+                time.sleep(interval)
+                write_json(path, self.metrics_snapshot())
+        threading.Thread(target=loop, daemon=True).start()
+
+    def invalidate(self):
+        """Forget what's on the panel so the next update pushes every key."""
+        self.pushed.clear()
 
     def set_page(self, page_index):
-        if page_index >= len(self.pages):
+        """
+        Switch pages without deck.reset(): every page's images are already in
+        the render cache, and only keys that differ from the panel are pushed.
+        """
+        if page_index < 0 or page_index >= len(self.pages):
             return
 
-        with self.deck_lock:
-            self.deck.reset()
+        start = time.perf_counter()
+        with self.update_lock:
+            self.current_page = page_index
+            self._apply_grid(self.page_grids[page_index])
+        self.switch_times.append((time.perf_counter() - start) * 1000)
+        del self.switch_times[:-100]
+
+    def next_page(self):
+        if self.pages:
+            self.set_page((self.current_page + 1) % len(self.pages))
+
+    def prev_page(self):
+        if self.pages:
+            self.set_page((self.current_page - 1) % len(self.pages))
+
+    def nav_key(self, target, text=None, image=None):
+        """Key dict that switches pages: target is "next", "prev" or a page index."""
+        if target == "next":
+            callback, label = self.next_page, "Next >"
+        elif target == "prev":
+            callback, label = self.prev_page, "< Prev"
+        else:
+            callback, label = (lambda: self.set_page(target)), f"Page {target + 1}"
+        key = {"text": text or label, "callback": callback}
+        if image:
+            key["image"] = image
+        return key
+
+    def page_switch_stats(self):
+        """Page switch latency over the last 100 switches, in ms."""
+        t = list(self.switch_times)
+        if not t:
+            return {"count": 0}
+        return {"count": len(t), "last_ms": t[-1], "mean_ms": sum(t) / len(t), "max_ms": max(t)}
+
+    def _apply_grid(self, grid):
+        callbacks = {i: (key, key['callback']) for i, key in enumerate(grid) if 'callback' in key}
+        self.grid, self.key_callbacks = grid, callbacks
+        self.update_all_states()
 
-        self.current_page = page_index
+    def add_page(self, grid):
+        self.pages.append(grid)
         flat = []
-        for row in self.pages[page_index]:
+        for row in grid:
             padded_row = row + [{"text": ""}] * (self.cols - len(row))
             flat.extend(padded_row)
 
         while len(flat) < self.rows * self.cols:
             flat.append({"text": ""})
 
-        self.grid = flat[:self.rows * self.cols]
-        self._apply_grid()
-
-    def _apply_grid(self):
-        self.key_callbacks.clear()
-        for i, key in enumerate(self.grid):
-            disabled = not self._is_enabled(key)
-            image = self._make_image(key.get('text', ''), key.get('image'), disabled=disabled)
-            with self.deck_lock:
-                self.deck.set_key_image(i, image)
-            if 'callback' in key:
-                self.key_callbacks[i] = key['callback']
+        self.page_grids.append(flat[:self.rows * self.cols])
 
-    def add_page(self, grid):
-        self.pages.append(grid)
+        # Keep every page's images warm (enabled + disabled) so switches are cache hits
+        self.image_cache_size = max(self.image_cache_size, 2 * self.rows * self.cols * len(self.pages))
+        with self.update_lock:
+            for key in self.page_grids[-1]:
+                for disabled in (False, True):
+                    self._make_image(key.get('text', ''), key.get('image'), disabled=disabled)
 
     def close(self):
         self.running = False
+        self.dispatcher.close()
         with self.deck_lock:
             self.deck.reset()
             self.deck.close()
+            self.pushed.clear()
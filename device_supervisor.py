@@ -0,0 +1,108 @@
+import threading
+import time
+
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+
+class DeviceSupervisor:
+    """
+    Keeps one device (Stream Deck, M5 serial port) alive across unplug and
+    USB resets without restarting main.py.
+
+    Every `interval` seconds, or right away on a udev usb/tty/hidraw event
+    when pyudev is installed, it calls is_connected(). While that's False it
+    calls reconnect() each pass until it returns True; reconnect() should
+    re-open the device and push the current state before returning.
+
+    stats: disconnects, reconnects, failed attempts, and per outage the time
+    the device was gone (outage_s) and how long the successful reconnect
+    took (recovery_ms).
+    """
+    def __init__(self, name, is_connected, reconnect, interval=1.0):
+        self.name = name
+        self.is_connected = is_connected
+        self.reconnect = reconnect
+        self.interval = interval
+        self.wake = threading.Event()
+        self.running = False
+        self.lock = threading.Lock()
+        self.stats = {"disconnects": 0, "reconnects": 0, "failed_attempts": 0,
+                      "last_outage_s": None, "last_recovery_ms": None, "recovery_ms_max": 0.0}
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        if pyudev is not None:
+            threading.Thread(target=self._udev, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def poke(self):
+        """Check now (e.g. after a write error) instead of at the next interval."""
+        self.wake.set()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def _run(self):
+        lost_at = None
+        while self.running:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            if not self.running:
+                return
+            try:
+                ok = self.is_connected()
+            except Exception:
+                ok = False
+            if ok:
+                continue
+            if lost_at is None:
+                lost_at = time.monotonic()
+                with self.lock:
+                    self.stats["disconnects"] += 1
+                print(f"[DeviceSupervisor] {self.name} lost, waiting for it to come back")
+
+            start = time.monotonic()
+            try:
+                back = self.reconnect()
+            except Exception as e:
+                print(f"[DeviceSupervisor] {self.name} reconnect failed: {e}")
+                back = False
+            if not back:
+                with self.lock:
+                    self.stats["failed_attempts"] += 1
+                continue
+
+            done = time.monotonic()
+            recovery_ms = (done - start) * 1000
+            with self.lock:
+                s = self.stats
+                s["reconnects"] += 1
+                s["last_outage_s"] = done - lost_at
+                s["last_recovery_ms"] = recovery_ms
+                s["recovery_ms_max"] = max(s["recovery_ms_max"], recovery_ms)
+            print(f"[DeviceSupervisor] {self.name} back after {done - lost_at:.1f} s, "
+                  f"state restored in {recovery_ms:.0f} ms")
+            lost_at = None
+
+    def _udev(self):
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            for subsystem in ("usb", "tty", "hidraw"):
+                monitor.filter_by(subsystem)
+            for _ in iter(monitor.poll, None):
+                if not self.running:
+                    return
+                self.wake.set()
+        except Exception as e:
+            print(f"[DeviceSupervisor] udev monitor unavailable, polling only: {e}")
@@ -0,0 +1,279 @@
+"""
+Local stand-in for a Hue bridge (v1 REST API), enough for phue and
+light_controller: username handshake, config, lights, lights/<id>/state,
+groups, groups/<id>/action (including scene recall) and scenes.
+
+  python fake_hue_bridge.py --port 8080 --latency 40 --jitter 20
+
+Latency/jitter are added to every request. Light commands are limited to
+`light_rate`/s and group commands to `group_rate`/s like the real bridge;
+over the limit requests either wait for a slot ("delay") or get the
+bridge's 901/503 error ("error"). `sticky` is the chance a light ignores
+hue/sat in a command, to exercise set_scene's read-back.
+"""
+import json, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+USERNAME = "fakeusername"
+
+
+class _Bucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, wait):
+        """Take a token; returns seconds waited, or None if none free and not waiting."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.at) * self.rate)
+            self.at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            if not wait:
+                return None
+            delay = (1 - self.tokens) / self.rate
+            self.tokens -= 1  # reserve it
+        time.sleep(delay)
+        return delay
+
+
+class FakeHueBridge:
+    def __init__(self, host="127.0.0.1", port=0, lights=(17, 16, 3), group_id=82,
+                 latency_ms=0.0, jitter_ms=0.0, light_rate=10, group_rate=1,
+                 over_limit="delay", sticky=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.over_limit = over_limit
+        self.sticky = sticky
+        self.light_bucket = _Bucket(light_rate)
+        self.group_bucket = _Bucket(group_rate)
+        self.lock = threading.Lock()
+        self.lights = {
+            str(lid): {"name": f"Light {lid}", "type": "Extended color light",
+                       "state": {"on": False, "bri": 254, "hue": 8401, "sat": 140, "reachable": True}}
+            for lid in lights
+        }
+        self.groups = {str(group_id): {"name": "Room", "lights": [str(l) for l in lights],
+                                       "action": {"on": False}}}
+        self.scenes = {}
+        self.counts = {}
+        self.throttled = 0
+        self.throttle_wait = 0.0
+
+        bridge = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                status, result = bridge.handle(self.command, self.path, body)
+                data = json.dumps(result).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = f"{host}:{self.server.server_address[1]}"
+        self.username = USERNAME
+
+    # ---------- lifecycle ----------
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.counts = {}
+            self.throttled = 0
+            self.throttle_wait = 0.0
+
+    def stats(self):
+        with self.lock:
+            return {"requests": sum(self.counts.values()), "by_kind": dict(self.counts),
+                    "throttled": self.throttled, "throttle_wait_ms": self.throttle_wait * 1000}
+
+    # ---------- request handling ----------
+    def _count(self, kind):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def _limit(self, bucket, address):
+        waited = bucket.take(self.over_limit == "delay")
+        if waited is None or waited > 0:
+            with self.lock:
+                self.throttled += 1
+                self.throttle_wait += waited or 0.0
+        if waited is None:
+            return [{"error": {"type": 901, "address": address, "description": "Internal error, 503"}}]
+        return None
+
+    def handle(self, method, path, body):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if method == "POST" and path.rstrip("/") == "/api":
+            self._count("register")
+            return 200, [{"success": {"username": self.username}}]
+
+        m = re.match(r"^/api/([^/]+)(/.*)?$", path)
+        if not m:
+            return 404, [{"error": {"type": 4, "address": path, "description": "method not available"}}]
+        if m.group(1) != self.username:
+            return 200, [{"error": {"type": 1, "address": path, "description": "unauthorized user"}}]
+        parts = [p for p in (m.group(2) or "").split("/") if p]
+        addr = "/" + "/".join(parts)
+
+        if not parts:
+            if method != "GET":
+                return 200, [{"error": {"type": 4, "address": addr, "description": "method not available"}}]
+            self._count("full")
+            with self.lock:
+                return 200, json.loads(json.dumps({"lights": self.lights, "groups": self.groups,
+                                                   "scenes": self.scenes, "config": self._config()}))
+        if method == "GET" and parts == ["config"]:
+            self._count("config")
+            return 200, self._config()
+
+        if parts[0] == "lights":
+            return self._lights(method, parts, body, addr)
+        if parts[0] == "groups":
+            return self._groups(method, parts, body, addr)
+        if parts[0] == "scenes":
+            return self._scenes(method, parts, body, addr)
+        return 200, [{"error": {"type": 4, "address": addr, "description": "method not available"}}]
+
+    def _config(self):
+        return {"name": "Fake Hue", "apiversion": "1.50.0", "swversion": "1950207110",
+                "whitelist": {self.username: {"name": "controllerv1"}}}
+
+    def _apply(self, light_id, state):
+        cur = self.lights[light_id]["state"]
+        sticky = self.sticky and random.random() < self.sticky
+        for k, v in state.items():
+            if k in ("hue", "sat") and sticky:
+                continue
+            if k in ("on", "bri", "hue", "sat", "ct", "xy"):
+                cur[k] = v
+        return [{"success": {f"/lights/{light_id}/state/{k}": v}} for k, v in state.items()]
+
+    def _lights(self, method, parts, body, addr):
+        if method == "GET":
+            self._count("get_light")
+            with self.lock:
+                if len(parts) == 1:
+                    return 200, json.loads(json.dumps(self.lights))
+                light = self.lights.get(parts[1])
+                if light is None:
+                    return 200, [{"error": {"type": 3, "address": addr, "description": "resource not available"}}]
+                return 200, json.loads(json.dumps(light))
+        if method == "PUT" and len(parts) == 3 and parts[2] == "state":
+            self._count("light_state")
+            err = self._limit(self.light_bucket, addr)
+            if err:
+                return 503, err
+            with self.lock:
+                if parts[1] not in self.lights:
+                    return 200, [{"error": {"type": 3, "address": addr, "description": "resource not available"}}]
+                return 200, self._apply(parts[1], body or {})
+        return 200, [{"error": {"type": 4, "address": addr, "description": "method not available"}}]
+
+    def _groups(self, method, parts, body, addr):
+        if method == "GET":
+            self._count("get_group")
+            with self.lock:
+                if len(parts) == 1:
+                    return 200, json.loads(json.dumps(self.groups))
+                return 200, json.loads(json.dumps(self.groups.get(parts[1], {})))
+        if method == "PUT" and len(parts) == 3 and parts[2] == "action":
+            self._count("group_action")
+            err = self._limit(self.group_bucket, addr)
+            if err:
+                return 503, err
+            body = body or {}
+            with self.lock:
+                gid = parts[1]
+                members = list(self.lights) if gid == "0" else self.groups.get(gid, {}).get("lights", [])
+                if "scene" in body:
+                    scene = self.scenes.get(body["scene"])
+                    if scene is None:
+                        return 200, [{"error": {"type": 7, "address": addr, "description": "invalid scene"}}]
+                    for lid, state in scene["lightstates"].items():
+                        if lid in self.lights:
+                            self._apply(lid, state)
+                else:
+                    for lid in members:
+                        self._apply(lid, body)
+            return 200, [{"success": {f"/groups/{parts[1]}/action/{k}": v}} for k, v in body.items()]
+        return 200, [{"error": {"type": 4, "address": addr, "description": "method not available"}}]
+
+    def _scenes(self, method, parts, body, addr):
+        self._count("scenes")
+        with self.lock:
+            if method == "GET" and len(parts) == 1:
+                return 200, {sid: {k: v for k, v in s.items() if k != "lightstates"}
+                             for sid, s in self.scenes.items()}
+            if method == "GET" and len(parts) == 2:
+                return 200, json.loads(json.dumps(self.scenes.get(parts[1], {})))
+            if method == "POST" and len(parts) == 1:
+                sid = f"fake{len(self.scenes) + 1}"
+                body = body or {}
+                self.scenes[sid] = {"name": body.get("name", sid), "type": body.get("type", "LightScene"),
+                                    "lights": body.get("lights", []),
+                                    "lightstates": body.get("lightstates", {})}
+                return 200, [{"success": {"id": sid}}]
+            if method == "PUT" and len(parts) == 4 and parts[2] == "lightstates":
+                scene = self.scenes.get(parts[1])
+                if scene is None:
+                    return 200, [{"error": {"type": 3, "address": addr, "description": "resource not available"}}]
+                scene["lightstates"][parts[3]] = body or {}
+                return 200, [{"success": {f"{addr}/{k}": v} for k, v in (body or {}).items()}]
+        return 200, [{"error": {"type": 4, "address": addr, "description": "method not available"}}]
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Run a fake Hue bridge")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--latency", type=float, default=0.0, help="ms added to every request")
+    p.add_argument("--jitter", type=float, default=0.0, help="+/- ms of random jitter")
+    p.add_argument("--over-limit", choices=("delay", "error"), default="delay")
+    p.add_argument("--sticky", type=float, default=0.0, help="Chance a light ignores hue/sat")
+    args = p.parse_args()
+
+    fake = FakeHueBridge(args.host, args.port, latency_ms=args.latency, jitter_ms=args.jitter,
+                         over_limit=args.over_limit, sticky=args.sticky).start()
+    print(f"Fake Hue bridge on {fake.address}, username '{fake.username}'")
+    try:
+        while True:
+            time.sleep(5)
+            print(fake.stats())
+    except KeyboardInterrupt:
+        fake.close()
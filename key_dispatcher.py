@@ -0,0 +1,97 @@
+from collections import deque
+import queue
+import threading
+import time
+
+
+class KeyDispatcher:
+    """
+    Runs Stream Deck key callbacks on a small worker pool instead of the
+    StreamDeck reader thread.
+
+    - Callbacks for the same key never overlap; presses queue up behind the
+      running one.
+    - If a key has a `coalesce(n)` function, presses that arrive while an
+      earlier one is still waiting are merged: five queued Volume Up taps
+      become a single coalesce(5) call. Keys without it run once per press.
+    """
+    def __init__(self, workers=3, on_done=None):
+        """on_done(key, latency_ms) is called after each callback, press to finish."""
+        self.lock = threading.Lock()
+        self.ready = queue.Queue()   # keys with work and no running callback
+        self.jobs = {}               # key -> deque of pending jobs
+        self.busy = set()            # keys with a queued/running callback
+        self.running = True
+        self.on_done = on_done
+        self.counters = {
+            "submitted": 0, "coalesced": 0, "completed": 0, "failed": 0,
+            "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+            "latency_ms_total": 0.0, "latency_ms_max": 0.0,
+        }
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, key, callback, coalesce=None):
+        now = time.monotonic()
+        with self.lock:
+            self.counters["submitted"] += 1
+            pending = self.jobs.setdefault(key, deque())
+            if coalesce is not None and pending and pending[-1]["coalesce"] is coalesce:
+                pending[-1]["count"] += 1
+                self.counters["coalesced"] += 1
+                return
+            pending.append({"callback": callback, "coalesce": coalesce, "count": 1, "at": now})
+            if key not in self.busy:
+                self.busy.add(key)
+                self.ready.put(key)
+
+    def _worker(self):
+        while True:
+            key = self.ready.get()
+            if key is None:
+                return
+            with self.lock:
+                job = self.jobs[key].popleft()
+            started = time.monotonic()
+            ok = True
+            try:
+                if job["count"] > 1:
+                    job["coalesce"](job["count"])
+                else:
+                    job["callback"]()
+            except Exception as e:
+                ok = False
+                print(f"[KeyDispatcher] Key {key} callback failed: {e}")
+            done = time.monotonic()
+            with self.lock:
+                c = self.counters
+                c["completed" if ok else "failed"] += 1
+                wait = (started - job["at"]) * 1000
+                latency = (done - job["at"]) * 1000
+                c["wait_ms_total"] += wait
+                c["wait_ms_max"] = max(c["wait_ms_max"], wait)
+                c["latency_ms_total"] += latency
+                c["latency_ms_max"] = max(c["latency_ms_max"], latency)
+                if self.jobs[key] and self.running:
+                    self.ready.put(key)
+                else:
+                    self.busy.discard(key)
+            if self.on_done is not None:
+                self.on_done(key, latency)
+
+    def stats(self):
+        """Counters plus current queue depth; times are from press to start (wait) / finish (latency)."""
+        with self.lock:
+            s = dict(self.counters)
+            s["queue_depth"] = sum(len(q) for q in self.jobs.values())
+            s["busy_keys"] = len(self.busy)
+        finished = s["completed"] + s["failed"]
+        s["wait_ms_mean"] = s.pop("wait_ms_total") / finished if finished else 0.0
+        s["latency_ms_mean"] = s.pop("latency_ms_total") / finished if finished else 0.0
+        return s
+
+    def close(self):
+        self.running = False
+        for _ in self.threads:
+            self.ready.put(None)
@@ -1,5 +1,9 @@
 from phue import Bridge
 import requests
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 
 BRIDGE_IP = "192.168.1.191"
@@ -15,24 +19,483 @@ scenes = {
 }
 
 lights_id = [17, 16, 3]
+GROUP_ID = 82
 
-b = Bridge(BRIDGE_IP)
-b.connect()
+USE_BRIDGE_SCENES = False     # store `scenes` on the bridge and recall them with one group action
+SCENE_PREFIX = "ControllerV1 "
+bridge_scenes = {}            # scene name -> bridge scene id, filled by store_scenes()
+
+_pool = ThreadPoolExecutor(max_workers=len(lights_id))
+group_lights = {GROUP_ID: lights_id}
+
+
+class HueClient:
+    """
+    Bridge that's only created on first use, talks to the bridge over one
+    keep-alive HTTP session instead of phue's connection-per-request, and
+    backs off (1s, 2s, 4s ... max_backoff) after failures so a missing bridge
+    fails fast instead of blocking every caller for the full timeout.
+    """
+    def __init__(self, ip, timeout=5, max_backoff=60, username=None):
+        self.ip = ip
+        self.username = username  # None: phue reads/registers it via ~/.python_hue
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.connect_lock = threading.Lock()  # one Bridge() at a time
+        self.lock = threading.Lock()          # session, backoff and stats; request() runs on pool threads
+        self._bridge = None
+        self.session = None
+        self.backoff = 0
+        self.retry_at = 0.0
+        self.stats = {"connects": 0, "connect_ms": None, "requests": 0, "failures": 0}
+
+    def bridge(self) -> Bridge:
+        with self.connect_lock:
+            if self._bridge is not None:
+                return self._bridge
+            with self.lock:
+                self._check_backoff()
+            start = time.perf_counter()
+            try:
+                bridge = Bridge(self.ip, self.username)
+            except Exception:
+                with self.lock:
+                    self._failed(None)
+                raise
+            bridge.request = self.request
+            # Small first round trip opens the pooled connection (get_api would pull the whole datastore)
+            self.request('GET', f"/api/{bridge.username}/config")
+            self._bridge = bridge
+            with self.lock:
+                self.stats["connects"] += 1
+                self.stats["connect_ms"] = (time.perf_counter() - start) * 1000
+            return bridge
+
+    def _check_backoff(self):
+        wait = self.retry_at - time.monotonic()
+        if wait > 0:
+            raise ConnectionError(f"Hue bridge unavailable, retrying in {wait:.0f}s")
+
+    def _failed(self, session):
+        self.stats["failures"] += 1
+        self.backoff = min(self.max_backoff, self.backoff * 2 or 1)
+        self.retry_at = time.monotonic() + self.backoff
+        if session is not None and self.session is session:
+            # Detach rather than close: other pool threads may still be mid-request on it;
+            # its connections go away when the last of them is done with it
+            self.session = None
+
+    def request(self, mode='GET', address=None, data=None):
+        """Drop-in for phue's Bridge.request over the shared session."""
+        with self.lock:
+            self._check_backoff()
+            if self.session is None:
+                self.session = requests.Session()
+            session = self.session
+        try:
+            r = session.request(mode, f"http://{self.ip}{address}", json=data, timeout=self.timeout)
+            result = r.json()
+        except (requests.RequestException, ValueError):
+            with self.lock:
+                self._failed(session)
+            raise
+        with self.lock:
+            self.backoff = 0
+            self.stats["requests"] += 1
+        return result
+
+hue = HueClient(BRIDGE_IP)
+
+
+class LightStateCache:
+    """
+    Last known on/bri/hue/sat of our lights, updated optimistically whenever
+    we send a command and by set_scene's read-backs. start() adds a
+    background refresh (one GET /lights per `interval`) for callers that
+    need to see changes made elsewhere. Readers never touch the network.
+    """
+    FIELDS = ("on", "bri", "hue", "sat")
+
+    def __init__(self, interval=10):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.states = {}     # light id -> {on, bri, hue, sat}
+        self.versions = {}   # light id -> bumped by every optimistic update
+        self.updated_at = None
+        self.listeners = []  # callback(scene name or None) when the matching scene changes
+        self._scene = None
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._poll, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _poll(self):
+        while self.running:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[LightStateCache] Refresh failed: {e}")
+            time.sleep(self.interval)
+
+    def refresh(self):
+        versions = self.read_versions()
+        lights = hue.bridge().get_light()
+        # Lights with a command still queued/in flight would read back their old state
+        self.update({int(lid): info["state"] for lid, info in lights.items()
+                     if int(lid) in lights_id and scheduler.settled(int(lid))}, read_versions=versions)
+
+    def read_versions(self):
+        """Take before reading the bridge; pass to update() so late reads can't undo newer commands."""
+        with self.lock:
+            return dict(self.versions)
+
+    def update(self, states: dict, read_versions=None):
+        """
+        Merge {light id: partial state}. Without read_versions it's an
+        optimistic update from a command. Bridge read-backs pass the
+        read_versions() taken before the request; lights updated
+        optimistically since then are skipped.
+        """
+        with self.lock:
+            for lid, state in states.items():
+                if read_versions is None:
+                    self.versions[lid] = self.versions.get(lid, 0) + 1
+                elif read_versions.get(lid, 0) != self.versions.get(lid, 0):
+                    continue
+                cur = self.states.setdefault(lid, {})
+                cur.update({k: state[k] for k in self.FIELDS if k in state})
+            self.updated_at = time.time()
+            scene = self._match()
+            changed = scene != self._scene
+            self._scene = scene
+        if changed:
+            for cb in self.listeners:
+                try:
+                    cb(scene)
+                except Exception as e:
+                    print(f"[LightStateCache] listener failed: {e}")
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def get(self, light_id):
+        with self.lock:
+            return dict(self.states.get(light_id, {}))
+
+    def snapshot(self):
+        with self.lock:
+            return {lid: dict(s) for lid, s in self.states.items()}
+
+    def current_scene(self):
+        """Name from `scenes` the lights currently match, "Off" if all are off, else None."""
+        with self.lock:
+            return self._scene
+
+    def _match(self):
+        if not all(lid in self.states for lid in lights_id):
+            return None
+        if not any(self.states[lid].get("on") for lid in lights_id):
+            return "Off"
+        for name in scenes:
+            if all(state_matches(self.states[lid], light_state(name, i)) for i, lid in enumerate(lights_id)):
+                return name
+        return None
+
+light_cache = LightStateCache()
+
+
+class HueScheduler:
+    """
+    Sits between callers and the bridge so bursts (Day/Night/Read mashing)
+    settle on the last request instead of replaying every one.
+
+    - One pending command per light (or group). A newer command for the same
+      light is merged over the pending one; a group command drops pending
+      commands for its lights.
+    - Commands go out oldest first through token buckets (`rate` light
+      commands/s, `group_rate` group commands/s; the bridge throttles above
+      ~10/s and ~1/s), on the shared pool so different lights overlap.
+      A light never has two commands in flight at once.
+    """
+    def __init__(self, rate=10, group_rate=1):
+        self.rate = rate
+        self.group_rate = group_rate
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()  # ("light", id) / ("group", id) -> entry
+        self.in_flight = set()
+        self.sent_seq = {}            # key -> seq of the last command sent
+        self.latest_seq = {}          # key -> seq of the newest command covering it (a group covers its lights)
+        self.seq = 0
+        self.tokens = {"light": float(rate), "group": float(group_rate)}
+        self.tokens_at = time.monotonic()
+        self.stats = {"submitted": 0, "superseded": 0, "sent": 0, "failed": 0,
+                      "queue_ms_last": 0.0, "queue_ms_max": 0.0, "queue_ms_total": 0.0}
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def submit_light(self, light_id, state: dict, expect=None) -> int:
+        """
+        Queue a state for one light; returns its seq. With `expect`, only
+        queue it if `expect` is still the newest seq for the light (for
+        retries that must not undo a newer command) and return 0 otherwise.
+        """
+        with self.cond:
+            self._start()
+            key = ("light", light_id)
+            if expect is not None and self._latest(key) != expect:
+                return 0
+            entry = self.pending.get(key)
+            if entry is not None:
+                entry["state"].update(state)  # keeps its place (and enqueue time) in the queue
+                self.stats["superseded"] += 1
+            else:
+                entry = self.pending[key] = {"state": dict(state), "at": time.monotonic()}
+            # A full "on" state for a light also covers it in any pending group command
+            if "on" in state:
+                for gkey, g in list(self.pending.items()):
+                    if gkey[0] == "group" and light_id in g["members"]:
+                        g["members"].discard(light_id)
+                        if not g["members"]:
+                            del self.pending[gkey]
+                            self.stats["superseded"] += 1
+            return self._stamp(key, entry)
+
+    def submit_group(self, group_id, action: dict) -> int:
+        """
+        Queue a group action; returns its seq, which also becomes the newest
+        seq of every member light, so per-light commands and retries from
+        before it count as superseded.
+        """
+        with self.cond:
+            self._start()
+            members = set(group_lights.get(group_id, ()))
+            for lid in members:
+                if self.pending.pop(("light", lid), None) is not None:
+                    self.stats["superseded"] += 1
+            key = ("group", group_id)
+            old = self.pending.pop(key, None)
+            if old is not None:
+                self.stats["superseded"] += 1
+            entry = self.pending[key] = {"state": dict(action), "members": members,
+                                         "at": old["at"] if old else time.monotonic()}
+            seq = self._stamp(key, entry)
+            for lid in members:
+                self.latest_seq[("light", lid)] = seq
+            return seq
+
+    def _stamp(self, key, entry):
+        self.seq += 1
+        entry["seq"] = self.seq
+        self.latest_seq[key] = self.seq
+        self.stats["submitted"] += 1
+        self.cond.notify_all()
+        return self.seq
+
+    def wait_sent(self, key, seq, timeout=10):
+        """
+        Block until the command `seq` for key has been sent, or a newer
+        command (including a group action) has taken over the key.
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.sent_seq.get(key, 0) < seq and self._latest(key) <= seq:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self.cond.wait(left)
+            return True
+
+    def wait_idle(self, timeout=10):
+        """Block until nothing is queued or in flight."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.in_flight:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self.cond.wait(left)
+            return True
+
+    def settled(self, light_id):
+        """True if nothing is queued or in flight for the light (or a group containing it)."""
+        with self.cond:
+            for key, entry in self.pending.items():
+                if key == ("light", light_id) or (key[0] == "group" and light_id in entry["members"]):
+                    return False
+            return not any(k == ("light", light_id) or (k[0] == "group" and light_id in group_lights.get(k[1], ()))
+                           for k in self.in_flight)
+
+    def latest(self, key):
+        """Seq of the newest command submitted for key (or its group), pending or sent."""
+        with self.cond:
+            return self._latest(key)
+
+    def _latest(self, key):
+        return self.latest_seq.get(key, 0)
+
+    def _blocked(self, key, entry):
+        if key in self.in_flight:
+            return True
+        if key[0] == "group":
+            return any(("light", lid) in self.in_flight for lid in entry["members"])
+        return any(k[0] == "group" and key[1] in group_lights.get(k[1], ()) for k in self.in_flight)
+
+    def _refill(self):
+        now = time.monotonic()
+        dt = now - self.tokens_at
+        self.tokens_at = now
+        self.tokens["light"] = min(self.rate, self.tokens["light"] + dt * self.rate)
+        self.tokens["group"] = min(self.group_rate, self.tokens["group"] + dt * self.group_rate)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                ready = next(((k, e) for k, e in self.pending.items() if not self._blocked(k, e)), None)
+                if ready is None:
+                    self.cond.wait(0.5)
+                    continue
+                key, entry = ready
+                self._refill()
+                kind = key[0]
+                if self.tokens[kind] < 1:
+                    rate = self.rate if kind == "light" else self.group_rate
+                    self.cond.wait((1 - self.tokens[kind]) / rate)
+                    continue  # re-pick: the newest state may have changed meanwhile
+                self.tokens[kind] -= 1
+                del self.pending[key]
+                self.in_flight.add(key)
+                queued = (time.monotonic() - entry["at"]) * 1000
+                self.stats["queue_ms_last"] = queued
+                self.stats["queue_ms_max"] = max(self.stats["queue_ms_max"], queued)
+                self.stats["queue_ms_total"] += queued
+            _pool.submit(self._send, key, entry)
+
+    def _send(self, key, entry):
+        ok = True
+        try:
+            b = hue.bridge()
+            if key[0] == "light":
+                b.set_light(key[1], entry["state"])
+            else:
+                b.set_group(key[1], entry["state"])
+        except Exception as e:
+            ok = False
+            print(f"[HueScheduler] {key[0]} {key[1]} command failed: {e}")
+        with self.cond:
+            self.in_flight.discard(key)
+            self.sent_seq[key] = max(self.sent_seq.get(key, 0), entry["seq"])
+            self.stats["sent" if ok else "failed"] += 1
+            self.cond.notify_all()
+
+    def queue_stats(self):
+        with self.cond:
+            s = dict(self.stats)
+            s["pending"] = len(self.pending)
+        done = s["sent"] + s["failed"]
+        s["queue_ms_mean"] = s.pop("queue_ms_total") / done if done else 0.0
+        return s
+
+scheduler = HueScheduler()
 
 
 def lights_off():
-    b.set_group(82, 'on', False)
+    scheduler.submit_group(GROUP_ID, {"on": False})
+    light_cache.update({lid: {"on": False} for lid in lights_id})
+
+def light_state(scene: str, i: int) -> dict:
+    """Full state for the i-th light of a scene, as one lights/<id>/state body."""
+    bri, hue_, sat = scenes[scene][i]
+    return {"on": True, "bri": bri, "hue": hue_, "sat": sat}
+
+# Bulbs report back slightly different values than they were given
+TOLERANCE = {"bri": 2, "hue": 400, "sat": 6}
+
+def state_matches(current: dict, target: dict) -> bool:
+    if current.get("on") != target["on"]:
+        return False
+    for k, tol in TOLERANCE.items():
+        if current.get(k) is None:
+            return False
+        diff = abs(current[k] - target[k])
+        if k == "hue":
+            diff = min(diff, 65536 - diff)  # hue wraps around
+        if diff > tol:
+            return False
+    return True
+
+def _converged(b, light_id, state, seq):
+    versions = light_cache.read_versions()
+    current = b.get_light(light_id)["state"]
+    # Only trust the read if no newer command (e.g. lights_off) took over meanwhile
+    if scheduler.latest(("light", light_id)) == seq:
+        light_cache.update({light_id: current}, read_versions=versions)
+    return state_matches(current, state)
+
+def set_scene(scene: str, verify=True, retries=2):
+    """
+    One state PUT per light, queued on the scheduler (rate-limited, lights in
+    parallel, newer scenes replace older pending ones). With verify, wait for
+    them to go out, read the lights back and re-send only those that didn't
+    take (hue/sat can be sticky). Lights a newer command has taken over are
+    left alone.
+    """
+    if USE_BRIDGE_SCENES and not bridge_scenes:
+        store_scenes()
+    targets = {lid: light_state(scene, i) for i, lid in enumerate(lights_id)}
+    if scene in bridge_scenes:
+        scheduler.submit_group(GROUP_ID, {"scene": bridge_scenes[scene]})
+        light_cache.update(targets)
+        return
+
+    seqs = {lid: scheduler.submit_light(lid, targets[lid]) for lid in targets}
+    light_cache.update(targets)
+    if not verify:
+        return
+    pending = list(targets)
+    for attempt in range(1 + retries):
+        if attempt:
+            seqs = {lid: scheduler.submit_light(lid, targets[lid], expect=seqs[lid]) for lid in pending}
+            pending = [lid for lid in pending if seqs[lid]]
+        for lid in pending:
+            scheduler.wait_sent(("light", lid), seqs[lid])
+        pending = [lid for lid in pending if scheduler.latest(("light", lid)) == seqs[lid]]
+        b = hue.bridge()
+        ok = list(_pool.map(lambda lid: _converged(b, lid, targets[lid], seqs[lid]), pending))
+        pending = [lid for lid, done in zip(pending, ok) if not done]
+        if not pending:
+            return
+    print(f"[light_controller] Lights {pending} didn't reach '{scene}'")
 
-def set_scene(scene: str):
-    lights = b.get_light_objects('id')
-    for light in range(len(lights_id)):
-        lights[lights_id[light]].on = True
-        lights[lights_id[light]].brightness = scenes[scene][light][0]
-        lights[lights_id[light]].hue = scenes[scene][light][1]
-        lights[lights_id[light]].saturation = scenes[scene][light][2]
+def store_scenes():
+    """Create/update every entry in `scenes` as a bridge scene so set_scene is one request."""
+    b = hue.bridge()
+    api = f"/api/{b.username}"
+    existing = {v.get("name"): k for k, v in b.request('GET', f"{api}/scenes").items()}
+    for name in scenes:
+        states = {str(lid): light_state(name, i) for i, lid in enumerate(lights_id)}
+        sid = existing.get(SCENE_PREFIX + name)
+        if sid is None:
+            result = b.request('POST', f"{api}/scenes", {
+                "name": SCENE_PREFIX + name, "type": "LightScene", "recycle": False,
+                "lights": list(states), "lightstates": states,
+            })
+            sid = result[0]["success"]["id"]
+        else:
+            for lid, state in states.items():
+                b.request('PUT', f"{api}/scenes/{sid}/lightstates/{lid}", state)
+        bridge_scenes[name] = sid
 
 
 
 if __name__ == "__main__":
     set_scene("Night")
-    print(b.get_light(3))
\ No newline at end of file
+    print(hue.bridge().get_light(3))
+    print(hue.stats)
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+Headless stand-in for the M5 running ImageDisplay.ino.
+
+Opens a pseudo-terminal and parses the byte stream the same way the
+firmware's loop()/handleIMG0/handleMETA_*_streamFastPath do, including the
+480px and 1024-byte limits, the 5 s readExact timeout and the resync quirks
+(a bad magic costs 4 bytes + 1 dropped byte, an unknown META type is
+skipped with nothing else consumed). Decoded state and per-frame timings
+are kept so send_cover.py / m5_process can be measured without hardware:
+
+  python m5_emulator.py              # prints the pty path, logs frames
+  M5_PORT=/dev/pts/N python main.py  # point the dashboard at it
+"""
+import io, os, pty, select, struct, threading, time, tty
+from PIL import Image
+
+READ_TIMEOUT = 5.0   # readExact default (ms in firmware)
+MAX_DIM = 480
+MAX_TEXT = 1024
+STALE_WINDOW_MS = 10000  # META_STATE this far behind the last one is stale; further back = new host session
+
+META_FULL, META_POS, META_VOL, META_STATE, META_POWER = 1, 2, 3, 4, 5
+
+
+class _Timeout(Exception):
+    pass
+
+
+class M5Emulator:
+    def __init__(self, baud=None, keep_frames=1000):
+        """
+        baud: if set, bytes are consumed no faster than a UART at this rate
+              (10 bits/byte), so writers feel realistic backpressure.
+        """
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)   # no newline/echo translation
+        self.port = os.ttyname(self.slave)
+        self.baud = baud
+        self.keep_frames = keep_frames
+        self.lock = threading.Lock()
+        self.running = False
+        self._buf = bytearray()
+        self._wire_free_at = 0.0  # monotonic time the simulated UART is idle again
+        self._frame_start = None
+
+        self.state = {
+            "cover": None, "cover_fmt": None, "title": "", "artist": "",
+            "duration": 0, "position": 0, "volume": 0, "playing": False,
+            "power": 0,
+        }
+        self._base_pos_ms = 0
+        self._base_at = time.monotonic()
+        self._last_host_ts = None
+        self.frames = []          # dicts: kind, start, end, ok (last keep_frames)
+        self.frame_count = 0
+        self.dropped_bytes = 0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.running = False
+        if getattr(self, "_thread", None):
+            self._thread.join(timeout=1)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- byte source (Serial.available/readBytes) ----------
+    def _fill(self, timeout):
+        r, _, _ = select.select([self.master], [], [], timeout)
+        if not r:
+            return False
+        try:
+            data = os.read(self.master, 65536)
+        except OSError:
+            return False
+        if self.baud:
+            # Pace consumption like a UART; the pty buffer pushes back on the writer.
+            now = time.monotonic()
+            start = max(now, self._wire_free_at)
+            self._wire_free_at = start + len(data) * 10 / self.baud
+            if self._wire_free_at > now:
+                time.sleep(self._wire_free_at - now)
+        self._buf += data
+        return True
+
+    def _read_exact(self, n, timeout=READ_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while len(self._buf) < n:
+            left = deadline - time.monotonic()
+            if left <= 0 or not self.running:
+                # Firmware keeps what it already read; those bytes are gone
+                self.dropped_bytes += len(self._buf)
+                self._buf.clear()
+                raise _Timeout()
+            self._fill(min(left, 0.1))
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    # ---------- main loop (loop()) ----------
+    def _run(self):
+        while self.running:
+            if len(self._buf) < 4 and not self._fill(0.05):
+                continue
+            if len(self._buf) < 4:
+                continue
+            self._frame_start = time.monotonic()
+            try:
+                magic = self._read_exact(4)
+                if magic == b"IMG0":
+                    self._record("IMG0", self._img0())
+                elif magic == b"META":
+                    (mtype,) = self._read_exact(1)
+                    if mtype == META_FULL:
+                        self._record("META_FULL", self._meta_full())
+                    elif mtype == META_POS:
+                        self._record("META_POS", self._meta_pos())
+                    elif mtype == META_VOL:
+                        self._record("META_VOL", self._meta_vol())
+                    elif mtype == META_STATE:
+                        self._record("META_STATE", self._meta_state())
+                    elif mtype == META_POWER:
+                        self._record("META_POWER", self._meta_power())
+                    else:
+                        self._record(f"META_{mtype}", False)
+                else:
+                    # Bad sync: firmware drops one more byte and tries again
+                    self.dropped_bytes += 4
+                    if self._buf:
+                        del self._buf[:1]
+                        self.dropped_bytes += 1
+            except _Timeout:
+                self._record("timeout", False)
+
+    def _record(self, kind, ok):
+        end = time.monotonic()
+        with self.lock:
+            self.frames.append({"kind": kind, "start": self._frame_start, "end": end, "ok": bool(ok)})
+            self.frame_count += 1
+            if len(self.frames) > self.keep_frames:
+                del self.frames[:len(self.frames) - self.keep_frames]
+
+    # ---------- handlers ----------
+    def _img0(self):
+        w, h, fmt, length = struct.unpack("<HHBI", self._read_exact(9))
+        if w == 0 or h == 0 or w > MAX_DIM or h > MAX_DIM or length == 0:
+            return False
+        if fmt == 3:
+            img = self._rle565(w, h, length)
+        else:
+            payload = self._read_exact(length)
+            img = None
+            try:
+                if fmt == 1:
+                    img = Image.open(io.BytesIO(payload)).convert("RGB")
+                elif fmt == 2:
+                    img = Image.frombytes("RGB", (w, h), payload, "raw", "BGR;16")
+            except Exception as e:
+                print(f"[M5Emulator] Couldn't decode fmt {fmt}: {e}")
+        with self.lock:
+            if img is not None:
+                self.state["cover"] = img
+                self.state["cover_fmt"] = fmt
+        return img is not None
+
+    def _rle565(self, w, h, length):
+        remaining = length
+        rows = bytearray()
+        for _ in range(h):
+            x = 0
+            row = bytearray()
+            while x < w:
+                if remaining < 1:
+                    return None
+                (ctrl,) = self._read_exact(1)
+                remaining -= 1
+                n = (ctrl & 0x7F) + 1
+                if x + n > w:
+                    return None
+                if ctrl & 0x80:
+                    if remaining < 2:
+                        return None
+                    row += self._read_exact(2) * n
+                    remaining -= 2
+                else:
+                    if remaining < n * 2:
+                        return None
+                    row += self._read_exact(n * 2)
+                    remaining -= n * 2
+                x += n
+            rows += row
+        if remaining:
+            return None
+        return Image.frombytes("RGB", (w, h), bytes(rows), "raw", "BGR;16")
+
+    def _meta_full(self):
+        title_len, artist_len, duration = struct.unpack("<HHI", self._read_exact(8))
+        if title_len > MAX_TEXT or artist_len > MAX_TEXT:
+            return False
+        title = self._read_exact(title_len).decode("utf-8", "replace")
+        artist = self._read_exact(artist_len).decode("utf-8", "replace")
+        with self.lock:
+            self.state.update(title=title, artist=artist, duration=duration)
+            if self.state["position"] > duration:
+                self.state["position"] = 0
+            self._last_host_ts = None  # like the firmware: next state is accepted as-is
+        return True
+
+    def _meta_pos(self):
+        (pos,) = struct.unpack("<I", self._read_exact(4))
+        with self.lock:
+            d = self.state["duration"]
+            self.state["position"] = min(pos, d) if d else pos
+            self._base_pos_ms = self.state["position"] * 1000
+            self._base_at = time.monotonic()
+        return True
+
+    def _meta_vol(self):
+        (vol,) = self._read_exact(1)
+        with self.lock:
+            self.state["volume"] = min(vol, 100)
+        return True
+
+    def _meta_state(self):
+        pos_ms, playing, host_ts = struct.unpack("<IBI", self._read_exact(9))
+        with self.lock:
+            if self._last_host_ts is not None:
+                age = ((host_ts - self._last_host_ts + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+                if -STALE_WINDOW_MS < age < 0:
+                    return True  # stale, firmware ignores it
+            self._last_host_ts = host_ts
+            self.state["playing"] = bool(playing)
+            self._base_pos_ms = pos_ms
+            self._base_at = time.monotonic()
+            self.state["position"] = pos_ms // 1000
+        return True
+
+    def _meta_power(self):
+        (level,) = self._read_exact(1)
+        with self.lock:
+            self.state["power"] = min(level, 2)
+        return True
+
+    # ---------- readers ----------
+    def snapshot(self):
+        """Current display state; position advances locally while playing, like tickProgress()."""
+        with self.lock:
+            snap = dict(self.state)
+            if snap["playing"]:
+                pos = (self._base_pos_ms + int((time.monotonic() - self._base_at) * 1000)) // 1000
+                snap["position"] = min(pos, snap["duration"]) if snap["duration"] else pos
+        return snap
+
+    def stats(self):
+        """Per-kind frame count and mean/max parse time (first magic byte to handled), in ms."""
+        with self.lock:
+            frames = list(self.frames)
+        out = {}
+        for f in frames:
+            s = out.setdefault(f["kind"], {"count": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0})
+            ms = (f["end"] - f["start"]) * 1000
+            s["count"] += 1
+            s["failed"] += 0 if f["ok"] else 1
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+        for s in out.values():
+            s["mean_ms"] = s.pop("total_ms") / s["count"]
+        if len(frames) > 1:
+            span = frames[-1]["end"] - frames[0]["start"]
+            out["_rate_hz"] = (len(frames) - 1) / span if span > 0 else 0.0
+        out["_dropped_bytes"] = self.dropped_bytes
+        return out
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Emulate the M5 display on a pseudo-terminal")
+    p.add_argument("--baud", type=int, default=None, help="Simulate UART speed (e.g. 921600)")
+    args = p.parse_args()
+
+    emu = M5Emulator(baud=args.baud).start()
+    print(f"M5 emulator listening on {emu.port}")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            with emu.lock:
+                new = emu.frames[-(emu.frame_count - seen):] if emu.frame_count > seen else []
+                seen = emu.frame_count
+            for f in new:
+                print(f"{f['kind']:<10} ok={f['ok']} {(f['end'] - f['start']) * 1000:.1f} ms")
+    except KeyboardInterrupt:
+        print(emu.snapshot())
+        print(emu.stats())
+    finally:
+        emu.close()
@@ -2,117 +2,258 @@ from music_player import MusicPlayer
 from multiprocessing import Process
 from StreamDeck.DeviceManager import DeviceManager
 from decklayer import DeckLayer
-from utils import execute
+from utils import execute, write_json
+from controls import MediaControl, Mixer, VolumeMonitor
+from send_cover import SerialLink, CoverWorker, find_m5_port
+from cover_cache import CoverCache
+from state_store import StateStore
+from adaptive_tick import AdaptiveTicker
+from device_supervisor import DeviceSupervisor
 from pathlib import Path
 from light_controller import *
+import threading
 import time
+import os
 
 # TODO: Add Early Alarm dismissal -> Podcast.
 
 
 STOP_FLAG   = Path("/home/bryson/code_projects/ControllerV1/daily-digest/stop.flag")    # presence/absence flag file
 RUNNING_FLAG = Path("/home/bryson/code_projects/ControllerV1/daily-digest/running.flag")  # indicates this program is active
-usb_out = "/dev/ttyACM0"
+usb_out = os.environ.get("M5_PORT", "/dev/ttyACM0")   # prefer /dev/serial/by-id/...; m5_emulator.py prints a pty to use here
+M5_USB_ID = os.environ.get("M5_USB_ID")          # "vid:pid" (e.g. 303a:1001) to find the M5 if M5_PORT is gone; unset = never scan
+M5_USB_SERIAL = os.environ.get("M5_USB_SERIAL")  # and its USB serial number, to tell identical boards apart
+STATE_DRIFT_SEC = 1.5   # resend playback state when the M5's estimate is off by this much
+COVER_CACHE_DIR = Path.home() / ".cache" / "controllerv1" / "covers"   # fitted/encoded album covers
+DECK_CACHE_DIR = Path.home() / ".cache" / "controllerv1" / "deck"       # prerendered Stream Deck icons
+DECK_METRICS = Path.home() / ".cache" / "controllerv1" / "deck_metrics.json"  # timing histograms, rewritten every minute
+DECK_REFRESH_SEC = 30  # fallback re-render for edited icons / `enabled` lambdas without "depends"
+M5_IDLE_STATS = Path.home() / ".cache" / "controllerv1" / "m5_idle.json"  # wakeups/CPU per player mode + reconnects, rewritten every 10 min
+M5_DIM_AFTER = 60      # seconds without playback before the M5 dims
+M5_SLEEP_AFTER = 600   # ... and before its panel goes off
+m5_link = None  # one SerialLink per process, opened on first use
+mixer = None    # one Mixer per process (ALSA / amixer -s session), opened on first use
+media = MediaControl("spotify")  # MPRIS over D-Bus, connects on first press
+
+# Everything the deck icons depend on; fed by the player follower and our own actions
+deck_state = StateStore(status="Stopped", loop="None")
+LOOP_ICONS = {"None": "assets/no_loop.jpg", "Playlist": "assets/playlist_loop.jpg", "Track": "assets/track_loop.jpg"}
+NEXT_LOOP = {"None": "Playlist", "Playlist": "Track", "Track": "None"}
+
+
+def get_m5_link():
+    global m5_link
+    if m5_link is None:
+        m5_link = SerialLink(usb_out, cache=CoverCache(COVER_CACHE_DIR))
+    return m5_link
+
+
+def get_mixer():
+    global mixer
+    if mixer is None:
+        mixer = Mixer("Master")
+    return mixer
+
+
+def find_deck():
+    decks = [d for d in DeviceManager().enumerate() if d.is_visual()]
+    return decks[0] if decks else None
 
 
 def m5_process():
-    mp = MusicPlayer()
+    mp = MusicPlayer(follow=True)  # cached snapshot, no playerctl per tick
+    # Fast ticks while playing, exponential back-off otherwise; player events wake us
+    ticker = AdaptiveTicker(fast=0.25, slow=1.0, max_interval=60.0)
+    mp.add_listener(lambda snap: ticker.poke())
+
+    # Whenever the port is (re)opened the M5 may have rebooted: the loop resends
+    # power, cover, meta, state and volume, then sets `resynced`
+    resync, resynced = threading.Event(), threading.Event()
+    link = get_m5_link()
+    link.on_open = lambda: (resync.set(), ticker.poke())
+
+    def reconnect_m5():
+        port = find_m5_port(usb_out, M5_USB_ID, M5_USB_SERIAL)
+        if port is None:
+            return False
+        resynced.clear()
+        if not link.reopen(port):
+            return False
+        resynced.wait(2)
+        return link.drain(2)
+
+    supervisor = DeviceSupervisor("M5", link.present, reconnect_m5).start()
+    covers = CoverWorker(link)
+    # Volume from any source (deck, keyboard, desktop) reaches the M5 once it settles.
+    # This process only reads the level (one amixer get per burst without
+    # pyalsaaudio), so it doesn't need an amixer -s session of its own.
+    volume_monitor = VolumeMonitor(Mixer("Master", session=False))
+    volume_monitor.add_listener(link.send_volume)
+    volume_monitor.start()
     current_title = ""
+    sent = None  # (position, playing, monotonic time) of the last state the M5 got
+    power = None  # display power level last sent (0 awake, 1 dim, 2 sleep)
+    idle_since = time.monotonic()
+    stats_at = time.monotonic()
     try:
         while True:
-            if mp.is_playing():
-                metadata = mp.get_metadata()
-                print(metadata)
-                if current_title != metadata[0]:
-                    # New song detected, update everything
-                    execute(f'python send_cover.py jpeg {usb_out} {metadata[-1]}').stdout[:-1]
-                    execute(f'python send_cover.py meta {usb_out} --title "{metadata[0]}" --artist "{metadata[1]}" --duration {metadata[3]}')
-                    execute(f'python send_cover.py pos {usb_out} --pos {metadata[2]}')
-                    current_title = metadata[0]
+            snap = mp.snapshot()
+            playing = snap["status"] == "Playing"
+            resyncing = resync.is_set()
+            if resyncing:
+                resync.clear()
+                power, sent, current_title = None, None, ""
+            ticker.set_mode("playing" if playing else "paused" if snap["status"] == "Paused" else "stopped")
+
+            now = time.monotonic()
+            if playing:
+                idle_since = now
+            idle = now - idle_since
+            level = 2 if idle > M5_SLEEP_AFTER else 1 if idle > M5_DIM_AFTER else 0
+            if level != power:
+                link.send_power(level)  # wake before anything else is drawn
+                power = level
+            if (playing or resyncing) and current_title != snap["title"]:
+                # New song detected (or a fresh M5), update everything
+                print(snap)
+                covers.submit(snap["artUrl"])  # sent whenever it's ready
+                link.send_meta(snap["title"], snap["artist"], snap["length"])
+                current_title = snap["title"]
+                sent = None
+
+            if current_title:
+                # The M5 advances the bar itself; only resend on seek/pause/drift
+                if sent is None or sent[1] != playing:
+                    changed = True
                 else:
-                    # Same song, update position only
-                    execute(f'python send_cover.py pos {usb_out} --pos {metadata[2]}')
+                    expected = sent[0] + (now - sent[2] if playing else 0)
+                    changed = abs(expected - snap["position"]) > STATE_DRIFT_SEC
+                if changed:
+                    link.send_state(snap["position"], playing)
+                    sent = (snap["position"], playing, now)
+
+            if resyncing:
+                if volume_monitor.volume is not None:
+                    link.send_volume(volume_monitor.volume)
+                resynced.set()
 
-            time.sleep(0.25)
+            if now - stats_at > 600:
+                write_json(M5_IDLE_STATS, dict(ticker.stats(), reconnect=supervisor.snapshot()))
+                stats_at = now
+            # Don't sleep through the next dim/sleep deadline
+            deadline = M5_DIM_AFTER - idle if level == 0 else M5_SLEEP_AFTER - idle if level == 1 else None
+            ticker.wait(None if playing else deadline)
     except KeyboardInterrupt:
         return
     except Exception as e:
         print(e)
+    finally:
+        write_json(M5_IDLE_STATS, dict(ticker.stats(), reconnect=supervisor.snapshot()))
+        supervisor.stop()
+        mp.close()
+        volume_monitor.stop()
+        covers.close()
+        link.close()
 
 def sd_process():
-    deck = DeviceManager().enumerate()[0]
+    deck = find_deck()
+    if deck is None:
+        print("Waiting for a Stream Deck...")
+    while deck is None:
+        time.sleep(2)
+        deck = find_deck()
+    cold_start = time.perf_counter()
     ui = DeckLayer(deck, 3, 5)
+    ui.precompile("assets", DECK_CACHE_DIR)
+    ui.bind(deck_state)
+    ui.start_metrics_dump(DECK_METRICS)
+
+    # One playerctl follower feeds status/loop; keys re-render only when those change
+    mp = MusicPlayer(follow=True)
+    mp.add_listener(lambda snap: deck_state.set(status=snap["status"], loop=snap["loop"]))
 
     ui.add_page([
-        [{"text": "Previous Song", "callback": lambda: execute("playerctl  -p spotify previous"), "image": "assets/previous_song.jpg"},
-        {"text": "Play/Pause", "callback": lambda: play_or_pause(), "image": lambda: play_or_pause(True)},
-        {"text": "Next Song", "callback": lambda: execute("playerctl  -p spotify next"), "image": "assets/next_song.jpg"},
-        {"text": "OFF", "callback": lambda: lights_off(), "image": "assets/lights_off.jpg"},
-        {"text": "Day", "callback": lambda: set_scene("Day"), "image": "assets/day_lights.jpg"}],
-
-        [{"text": "Rewind 10s", "callback": lambda: execute("playerctl -p spotify position 10-"), "image": "assets/rewind.jpg"},
-        {"text": "Loop", "callback": lambda: loop_mode(), "image": lambda: loop_mode(True)},
-        {"text": "Fast Forward 10s", "callback": lambda: execute("playerctl -p spotify position 10+"), "image": "assets/fast_forward.jpg"},
-        {"text": "Night", "callback": lambda: set_scene("Night"), "image": "assets/night_lights.jpg"},
-        {"text": "Read", "callback": lambda: set_scene("Reading"), "image": "assets/read.jpg"}],
-
-        [{"text": "Mute", "callback": lambda: volume("amixer set Master 0%"), "image": "assets/mute.jpg"},
-        {"text": "Volume Down", "callback": lambda: volume("amixer set Master 6%-"), "image": "assets/volume_down.jpg"},
-        {"text": "Volume Up", "callback": lambda: volume("amixer set Master 6%+"), "image": "assets/volume_up.jpg"},
+        [{"text": "Previous Song", "callback": lambda: media.previous(), "image": "assets/previous_song.jpg"},
+        {"text": "Play/Pause", "callback": lambda: play_or_pause(), "image": lambda: play_or_pause(True), "depends": ["status"]},
+        {"text": "Next Song", "callback": lambda: media.next(), "image": "assets/next_song.jpg"},
+        {"text": "OFF", "callback": lambda: apply_scene("Off"), "image": "assets/lights_off.jpg"},
+        {"text": "Day", "callback": lambda: apply_scene("Day"), "image": "assets/day_lights.jpg"}],
+
+        [{"text": "Rewind 10s", "callback": lambda: media.seek(-10), "image": "assets/rewind.jpg",
+          "coalesce": lambda n: media.seek(-10 * n)},
+        {"text": "Loop", "callback": lambda: loop_mode(), "image": lambda: loop_mode(True), "depends": ["loop"]},
+        {"text": "Fast Forward 10s", "callback": lambda: media.seek(10), "image": "assets/fast_forward.jpg",
+         "coalesce": lambda n: media.seek(10 * n)},
+        {"text": "Night", "callback": lambda: apply_scene("Night"), "image": "assets/night_lights.jpg"},
+        {"text": "Read", "callback": lambda: apply_scene("Reading"), "image": "assets/read.jpg"}],
+
+        [{"text": "Mute", "callback": lambda: volume(to=0), "image": "assets/mute.jpg"},
+        {"text": "Volume Down", "callback": lambda: volume(-6), "image": "assets/volume_down.jpg",
+         "coalesce": lambda n: volume(-6 * n)},
+        {"text": "Volume Up", "callback": lambda: volume(6), "image": "assets/volume_up.jpg",
+         "coalesce": lambda n: volume(6 * n)},
         {"text": "Wake Up", "callback": lambda: trigger_stop_if_running(), "image": "assets/wake_up.jpg"},
         {"text": "Sleep", "callback": lambda: execute("loginctl lock-session"), "image": "assets/sleep.jpg"}]
     ])
     ui.set_page(0)
+    print(f"Stream Deck Online in {(time.perf_counter() - cold_start) * 1000:.0f} ms.")
+
+    # Unplug / USB reset: re-open the deck and repaint from the render cache
+    def reattach():
+        deck = find_deck()
+        return deck is not None and ui.attach(deck) is not None
+    supervisor = DeviceSupervisor("Stream Deck", ui.connected, reattach).start()
+    ui.on_lost = supervisor.poke  # a failed push means it's gone; don't wait for the next check
 
     try:
-        print("Stream Deck Online.")
         while True:
-            ui.update_all_states()
-            time.sleep(0.5)
+            # Keys update from deck_state notifications; this slow pass catches
+            # what those can't see (icon files edited on disk, `enabled` lambdas
+            # without "depends"). Unchanged keys aren't re-sent; while the deck
+            # is unplugged the supervisor's attach() repaints instead.
+            time.sleep(DECK_REFRESH_SEC)
+            if ui.connected():
+                ui.update_all_states()
     except KeyboardInterrupt:
+        supervisor.stop()
+        mp.close()
+        get_mixer().close()
         ui.close()
     except Exception as e:
         print('streamdeck error!',e)
 
 
-def volume(query):
-    execute(query)
-    volume = execute("amixer get Master", True)
-    execute(f"python send_cover.py vol {usb_out} --vol {volume}")
+def volume(delta=0, to=None):
+    # The M5 hears about it from m5_process's VolumeMonitor
+    if to is not None:
+        get_mixer().set(to)
+    else:
+        get_mixer().change(delta)
+
+def apply_scene(scene):
+    if scene == "Off":
+        lights_off()
+    else:
+        set_scene(scene)
 
 def loop_mode(readonly=False):
+    loop = deck_state.get("loop") or "None"
+    if readonly:
+        return LOOP_ICONS.get(loop, "assets/no_loop.jpg")
     try:
-        loop = execute("playerctl -p spotify loop").stdout
-        if loop == "None\n":
-            if readonly:
-                return "assets/no_loop.jpg"
-            execute("playerctl -p spotify loop Playlist")
-        elif loop == "Playlist\n":
-            if readonly:
-                return "assets/playlist_loop.jpg"
-            execute("playerctl -p spotify loop Track")
-        elif loop == "Track\n":
-            if readonly:
-                return "assets/track_loop.jpg"
-            execute("playerctl -p spotify loop None")
+        nxt = NEXT_LOOP.get(loop, "Playlist")
+        media.set_loop(nxt)
+        deck_state.set(loop=nxt)  # the player follower confirms it shortly after
     except Exception as e:
         print(e)
-        if readonly:
-            return "assets/no_loop.jpg"
 
 def play_or_pause(readonly=False):
+    if readonly:
+        return "assets/pause.jpg" if deck_state.get("status") == "Playing" else "assets/play.jpg"
     try:
-        if execute("playerctl -p spotify status").stdout == 'Playing\n':
-            if readonly:
-                return "assets/pause.jpg"
-            
-        else:
-            if readonly:
-                return "assets/play.jpg"
-        execute("playerctl -p spotify play-pause")
-    except:
-        if readonly:
-            return "assets/pause.jpg"
+        media.play_pause()
+    except Exception as e:
+        print(e)
         
 def trigger_stop_if_running():
     """If running.flag exists, create stop.flag."""
@@ -1,37 +1,133 @@
 from utils import execute
+import subprocess
+import threading
+import time
+
+# One line per change from `playerctl --follow`. Title goes last so a stray
+# tab in it can't shift the other fields.
+FOLLOW_FIELDS = ["status", "loop", "mpris:length", "position", "mpris:artUrl", "artist", "title"]
+FOLLOW_FORMAT = "\t".join("{{%s}}" % f for f in FOLLOW_FIELDS)
 
 
 class MusicPlayer:
-    def __init__(self):
-        pass
+    def __init__(self, follow=False, player="spotify"):
+        """
+        follow=False: every call shells out to playerctl (original behaviour).
+        follow=True:  one long-lived `playerctl --follow` keeps a cached
+                      snapshot up to date; reads never spawn a process.
+        """
+        self.player = player
+        self.follow = follow
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.state = {
+            "title": "", "artist": "", "length": 0, "artUrl": "",
+            "status": "Stopped", "loop": "None",
+        }
+        self._pos = 0.0           # seconds, as last reported
+        self._pos_at = time.monotonic()
+        self._proc = None
+        self.running = follow
+        if follow:
+            self._thread = threading.Thread(target=self._follow_loop, daemon=True)
+            self._thread.start()
+
+    # ---------- event-driven mode ----------
+    def add_listener(self, callback):
+        """callback(snapshot) is called from the follower thread after every change."""
+        self.listeners.append(callback)
+
+    def snapshot(self):
+        """Cached state plus a position (float seconds) extrapolated from the monotonic clock."""
+        with self.lock:
+            snap = dict(self.state)
+            pos = self._pos
+            if snap["status"] == "Playing":
+                pos += time.monotonic() - self._pos_at
+        if snap["length"]:
+            pos = min(pos, snap["length"])
+        snap["position"] = pos
+        return snap
+
+    def _follow_loop(self):
+        cmd = ["playerctl", "-p", self.player, "metadata", "--follow", "--format", FOLLOW_FORMAT]
+        retry = 1
+        while self.running:
+            try:
+                self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                              text=True, bufsize=1)
+                for line in self._proc.stdout:
+                    retry = 1
+                    self._on_line(line.rstrip("\n"))
+            except Exception as e:
+                print(f"[MusicPlayer] playerctl follow failed: {e}")
+            if self.running:
+                # playerctl exited (not installed / crashed); back off so a
+                # missing player doesn't mean a process spawn every second
+                time.sleep(retry)
+                retry = min(retry * 2, 60)
+
+    def _on_line(self, line):
+        parts = line.split("\t", len(FOLLOW_FIELDS) - 1)
+        with self.lock:
+            if len(parts) < len(FOLLOW_FIELDS):
+                # Empty line = player went away
+                self.state.update(title="", artist="", length=0, artUrl="", status="Stopped")
+                self._pos, self._pos_at = 0.0, time.monotonic()
+            else:
+                status, loop, length, pos, art, artist, title = parts
+                self.state.update(
+                    status=status or "Stopped", loop=loop or "None",
+                    length=int(length) // 1_000_000 if length.isdigit() else 0,
+                    artUrl=art, artist=artist, title=title,
+                )
+                self._pos = int(pos) / 1_000_000 if pos.isdigit() else 0.0
+                self._pos_at = time.monotonic()
+        snap = self.snapshot()
+        for cb in self.listeners:
+            try:
+                cb(snap)
+            except Exception as e:
+                print(f"[MusicPlayer] listener failed: {e}")
+
+    def close(self):
+        self.running = False
+        if self._proc is not None:
+            self._proc.terminate()
 
+    # ---------- polling API ----------
     def is_playing(self):
-        return execute("playerctl -p spotify status").stdout == "Playing\n"
+        if self.follow:
+            return self.snapshot()["status"] == "Playing"
+        return execute(f"playerctl -p {self.player} status").stdout == "Playing\n"
 
     # Title, Artist, Position, Track Length, Album Cover
     def get_metadata(self):
+        if self.follow:
+            s = self.snapshot()
+            return [s["title"], s["artist"], int(s["position"]), s["length"], s["artUrl"]]
         data = []
         tags = {
             "title": '', "artist": '', "mpris:length": 0, "mpris:artUrl": ''
         }
         for tag in tags.keys():
             try:
-                data_point = execute(f"playerctl -p spotify metadata {tag}").stdout[:-1]
+                data_point = execute(f"playerctl -p {self.player} metadata {tag}").stdout[:-1]
                 if tag == "mpris:length":
                     data_point = int(data_point[:-6])
                 data.append(data_point)
             except Exception as e:
                 print(e)
                 data.append(tags[tag])
-        data.insert(2, execute("playerctl -p spotify position").stdout[:-1])
+        data.insert(2, execute(f"playerctl -p {self.player} position").stdout[:-1])
         if data[2] != "":
             data[2] = int(float(data[2])) # Convert position to int (seconds)
         else:
             data[2] = 0
         return (data)
-    
+
 
 if __name__ == "__main__":
     mp = MusicPlayer()
     print(mp.is_playing())
-    print(mp.get_metadata())
\ No newline at end of file
+    print(mp.get_metadata())
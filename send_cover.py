@@ -1,5 +1,12 @@
-import io, struct, sys, argparse, requests, serial
-from PIL import Image
+import io, os, struct, sys, argparse, requests, serial, threading, queue, time
+from serial.tools import list_ports
+from PIL import Image, ImageChops
+from cover_cache import CoverCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def fetch_image(url: str) -> Image.Image:
     r = requests.get(url, timeout=10)
@@ -18,8 +25,8 @@ def center_fit(img: Image.Image, target_w: int, target_h: int, bg=(0,0,0)) -> Im
     canvas.paste(resized, (x, y))
     return canvas
 
-def to_rgb565_bytes(img: Image.Image) -> bytes:
-    """Convert RGB PIL image to RGB565 little-endian bytes."""
+def _to_rgb565_bytes_slow(img: Image.Image) -> bytes:
+    """Reference per-pixel encoder, used to verify the fast paths."""
     assert img.mode == "RGB"
     out = bytearray()
     for r, g, b in img.getdata():
@@ -27,34 +34,234 @@ def to_rgb565_bytes(img: Image.Image) -> bytes:
         out += struct.pack("<H", rgb565)
     return bytes(out)
 
-def send_frame(ser: serial.Serial, fmt: int, w: int, h: int, payload: bytes):
+# Byte lookup tables for the Pillow path. RGB565 little-endian is
+#   low  = ggg bbbbb  -> ((g & 0x1C) << 3) | (b >> 3)
+#   high = rrrrr ggg  -> (r & 0xF8) | (g >> 5)
+# The bit ranges never overlap, so ImageChops.add can't clip.
+_LUT_R_HI = [v & 0xF8 for v in range(256)]
+_LUT_G_HI = [v >> 5 for v in range(256)]
+_LUT_G_LO = [(v & 0x1C) << 3 for v in range(256)]
+_LUT_B_LO = [v >> 3 for v in range(256)]
+
+def _rgb565_numpy(img: Image.Image, out: bytearray):
+    px = np.asarray(img, dtype=np.uint16)
+    dst = np.frombuffer(out, dtype="<u2").reshape(px.shape[0], px.shape[1])
+    np.bitwise_and(px[:, :, 0], 0xF8, out=dst)
+    dst <<= 8
+    dst |= (px[:, :, 1] & 0xFC) << 3
+    dst |= px[:, :, 2] >> 3
+
+def _rgb565_pillow(img: Image.Image, out: bytearray):
+    r, g, b = img.split()
+    lo = ImageChops.add(g.point(_LUT_G_LO), b.point(_LUT_B_LO))
+    hi = ImageChops.add(r.point(_LUT_R_HI), g.point(_LUT_G_HI))
+    out[:] = Image.merge("LA", (lo, hi)).tobytes()
+
+def _rgb565_reference(img: Image.Image, out: bytearray):
+    out[:] = _to_rgb565_bytes_slow(img)
+
+_rgb565_impl = None
+
+def _pick_rgb565_impl():
+    """Use the fastest encoder that matches the reference byte-for-byte."""
+    global _rgb565_impl
+    if _rgb565_impl is not None:
+        return _rgb565_impl
+    # Every value of each channel shows up in this 256x3 strip.
+    probe = Image.new("RGB", (256, 3))
+    probe.putdata([(v, (v * 7) & 0xFF, 255 - v) for v in range(256)]
+                  + [((v * 3) & 0xFF, v, (v * 5) & 0xFF) for v in range(256)]
+                  + [((v * 11) & 0xFF, 255 - v, v) for v in range(256)])
+    expected = _to_rgb565_bytes_slow(probe)
+    candidates = [_rgb565_numpy] if np is not None else []
+    candidates.append(_rgb565_pillow)
+    for impl in candidates:
+        try:
+            buf = bytearray(len(expected))
+            impl(probe, buf)
+            if bytes(buf) == expected:
+                _rgb565_impl = impl
+                return impl
+        except Exception as e:
+            print(f"[send_cover] {impl.__name__} unavailable: {e}")
+    _rgb565_impl = _rgb565_reference
+    return _rgb565_impl
+
+def to_rgb565_bytes(img: Image.Image) -> bytearray:
+    """
+    Convert RGB PIL image to RGB565 little-endian pixels, returned as a new
+    bytearray on every call (no extra copy to bytes), so it can be queued
+    or cached safely.
+    """
+    assert img.mode == "RGB"
+    buf = bytearray(img.size[0] * img.size[1] * 2)
+    _pick_rgb565_impl()(img, buf)
+    return buf
+
+RLE_MAX = 128  # pixels per packet (7-bit count + 1)
+
+def encode_rle565(img: Image.Image) -> bytes:
+    """
+    fmt 3: lossless row-wise RLE of RGB565 little-endian pixels.
+    Packets never cross a row so the M5 can decode one row at a time:
+      ctrl & 0x80 -> run of (ctrl & 0x7F)+1 copies of the next 2-byte pixel
+      otherwise   -> literal of ctrl+1 pixels (2 bytes each)
+    """
+    w, h = img.size
+    raw = to_rgb565_bytes(img)
+    # Only equality is compared, so native-endian cast is fine; bytes are
+    # copied straight out of `raw`.
+    px = memoryview(raw).cast("H")
+    out = bytearray()
+    for y in range(h):
+        i = y * w
+        end = i + w
+        lit = i  # start of the pending literal
+        while i < end:
+            v = px[i]
+            j = i + 1
+            while j < end and j - i < RLE_MAX and px[j] == v:
+                j += 1
+            if j - i >= 2:
+                _flush_literal(out, raw, lit, i)
+                out.append(0x80 | (j - i - 1))
+                out += raw[i*2:i*2 + 2]
+                i = lit = j
+            else:
+                i = j
+        _flush_literal(out, raw, lit, end)
+    return bytes(out)
+
+def _flush_literal(out: bytearray, raw: bytearray, start: int, stop: int):
+    while start < stop:
+        n = min(RLE_MAX, stop - start)
+        out.append(n - 1)
+        out += raw[start*2:(start + n)*2]
+        start += n
+
+def pack_frame(fmt: int, w: int, h: int, payload: bytes) -> bytes:
     # IMG0 header: <4sHHBI
     header = struct.pack("<4sHHBI", b"IMG0", w, h, fmt, len(payload))
-    ser.write(header)
-    ser.write(payload)
+    return header + payload
+
+def send_frame(ser: serial.Serial, fmt: int, w: int, h: int, payload: bytes):
+    ser.write(pack_frame(fmt, w, h, payload))
     ser.flush()
 
-def send_jpeg(url: str, port: str, baud=921600, target=(320,240), quality=85):
-    img = fetch_image(url)
-    fitted = center_fit(img, target[0], target[1])
+def encode_jpeg(img: Image.Image, quality=85, subsampling=-1) -> bytes:
     buf = io.BytesIO()
-    fitted.save(buf, format="JPEG", quality=quality, optimize=True)
-    jpg = buf.getvalue()
+    img.save(buf, format="JPEG", quality=quality, optimize=True, subsampling=subsampling)
+    return buf.getvalue()
+
+SUBSAMPLING = {0: "4:4:4", 1: "4:2:2", 2: "4:2:0"}
+IMG0_HEADER_LEN = struct.calcsize("<4sHHBI")
+
+def budget_bytes(max_ms: float, baud=921600) -> int:
+    """Largest IMG0 payload that fits in max_ms at this baud (10 bits/byte on the wire)."""
+    return max(0, int(max_ms / 1000 * baud / 10) - IMG0_HEADER_LEN)
+
+def resolve_budget(max_bytes: int = None, max_ms: float = None, baud=921600):
+    """Combine a byte and/or time budget into one byte limit (None = no budget)."""
+    if max_ms is None:
+        return max_bytes
+    by_time = budget_bytes(max_ms, baud)
+    return by_time if max_bytes is None else min(max_bytes, by_time)
+
+def encode_jpeg_budget(img: Image.Image, max_bytes: int, quality=85, min_quality=30, max_trials=6):
+    """
+    Best-looking JPEG that fits in max_bytes, using at most max_trials encodes.
+      1. `quality` at 4:2:0 (what encode_jpeg does by default)
+      2. if that fits, try 4:4:4 at the same quality for sharper colour
+      3. otherwise binary-search quality down to min_quality at 4:2:0
+    Returns (payload, settings) where settings has quality, subsampling,
+    bytes, trials and fits. If nothing fits the smallest attempt is returned.
+    """
+    trials = 0
+    def attempt(q, sub):
+        nonlocal trials
+        trials += 1
+        return encode_jpeg(img, q, sub)
+
+    best = attempt(quality, 2)
+    best_q, best_sub = quality, 2
+    if len(best) <= max_bytes:
+        if trials < max_trials:
+            full = attempt(quality, 0)
+            if len(full) <= max_bytes:
+                best, best_sub = full, 0
+    else:
+        lo, hi = min_quality, quality - 1
+        fallback = (best, quality)
+        best = None
+        while lo <= hi and trials < max_trials:
+            q = (lo + hi) // 2
+            jpg = attempt(q, 2)
+            if len(jpg) <= max_bytes:
+                best, best_q = jpg, q
+                lo = q + 1
+            else:
+                if len(jpg) < len(fallback[0]):
+                    fallback = (jpg, q)
+                hi = q - 1
+        if best is None:
+            best, best_q = fallback
+    settings = {
+        "quality": best_q, "subsampling": SUBSAMPLING[best_sub],
+        "bytes": len(best), "trials": trials, "fits": len(best) <= max_bytes,
+    }
+    return best, settings
+
+def encode_cover(url: str, fmt: int, target=(320,240), quality=85, cache: CoverCache = None,
+                 max_bytes: int = None) -> bytes:
+    """
+    Fetch, fit and encode a cover (fmt 1=JPEG, 2=RGB565, 3=RLE RGB565), going through `cache` if given.
+    For JPEG, max_bytes switches to encode_jpeg_budget with `quality` as the ceiling.
+    A freshly encoded RGB565 payload is the bytearray from to_rgb565_bytes.
+    """
+    q = None
+    if fmt == 1:
+        q = quality if max_bytes is None else f"{quality}/{max_bytes}"
+    if cache is not None:
+        payload = cache.get(url, target, fmt, q)
+        if payload is not None:
+            return payload
+    fitted = center_fit(fetch_image(url), target[0], target[1])
+    if fmt == 1 and max_bytes is not None:
+        payload, settings = encode_jpeg_budget(fitted, max_bytes, quality)
+        print(f"[send_cover] JPEG q={settings['quality']} {settings['subsampling']} "
+              f"{settings['bytes']} B in {settings['trials']} trials (budget {max_bytes} B)")
+    elif fmt == 1:
+        payload = encode_jpeg(fitted, quality)
+    elif fmt == 3:
+        payload = encode_rle565(fitted)
+    else:
+        payload = to_rgb565_bytes(fitted)
+    if cache is not None:
+        cache.put(url, target, fmt, q, payload)
+    return payload
+
+def send_jpeg(url: str, port: str, baud=921600, target=(320,240), quality=85, cache: CoverCache = None,
+              max_bytes: int = None, max_ms: float = None):
+    max_bytes = resolve_budget(max_bytes, max_ms, baud)
+    jpg = encode_cover(url, 1, target, quality, cache, max_bytes=max_bytes)
     with serial.Serial(port, baudrate=baud, timeout=5) as ser:
         send_frame(ser, fmt=1, w=target[0], h=target[1], payload=jpg)
 
-def send_rgb565(url: str, port: str, baud=921600, target=(320,240)):
-    img = fetch_image(url)
-    fitted = center_fit(img, target[0], target[1])
-    rgb565 = to_rgb565_bytes(fitted)
+def send_rgb565(url: str, port: str, baud=921600, target=(320,240), cache: CoverCache = None):
+    rgb565 = encode_cover(url, 2, target, cache=cache)
     with serial.Serial(port, baudrate=baud, timeout=5) as ser:
         send_frame(ser, fmt=2, w=target[0], h=target[1], payload=rgb565)
 
+def send_rle565(url: str, port: str, baud=921600, target=(320,240), cache: CoverCache = None):
+    rle = encode_cover(url, 3, target, cache=cache)
+    with serial.Serial(port, baudrate=baud, timeout=5) as ser:
+        send_frame(ser, fmt=3, w=target[0], h=target[1], payload=rle)
+
 # ----------------------
 # NEW: metadata & progress messages over Serial
 # ----------------------
 
-def send_meta(port: str, title: str, artist: str, duration_sec: int, baud=921600):
+def pack_meta(title: str, artist: str, duration_sec: int) -> bytes:
     """
     META(type=1): <4s B H H I> + title_bytes + artist_bytes
       magic="META", type=1, title_len, artist_len, duration_sec
@@ -62,33 +269,299 @@ def send_meta(port: str, title: str, artist: str, duration_sec: int, baud=921600
     t_bytes = title.encode("utf-8")
     a_bytes = artist.encode("utf-8")
     header = struct.pack("<4sBHHI", b"META", 1, len(t_bytes), len(a_bytes), int(duration_sec))
-    with serial.Serial(port, baudrate=baud, timeout=5) as ser:
-        ser.write(header)
-        ser.write(t_bytes)
-        ser.write(a_bytes)
-        ser.flush()
+    return header + t_bytes + a_bytes
 
-def send_pos(port: str, position_sec: int, baud=921600):
+def pack_pos(position_sec: int) -> bytes:
     """
     META(type=2): <4s B I>
       magic="META", type=2, position_sec
     """
-    header = struct.pack("<4sBI", b"META", 2, int(position_sec))
-    with serial.Serial(port, baudrate=baud, timeout=5) as ser:
-        ser.write(header)
-        ser.flush()
+    return struct.pack("<4sBI", b"META", 2, int(position_sec))
 
-def send_volume(port: str, volume_pct: int, baud=921600):
+def pack_volume(volume_pct: int) -> bytes:
     """
     META(type=3): <4s B B>
       magic="META", type=3, volume_pct (0..100)
     """
     v = max(0, min(100, int(volume_pct)))
-    header = struct.pack("<4sBB", b"META", 3, v)
+    return struct.pack("<4sBB", b"META", 3, v)
+
+def pack_state(position_sec: float, playing: bool, timestamp_ms: int = None) -> bytes:
+    """
+    META(type=4): <4s B I B I>
+      magic="META", type=4, position_ms, playing (0/1), host timestamp_ms
+    The M5 advances the progress bar itself from this while playing; the
+    timestamp (host monotonic ms, wraps at 2^32) lets it drop stale states.
+    """
+    if timestamp_ms is None:
+        timestamp_ms = int(time.monotonic() * 1000)
+    pos_ms = max(0, int(position_sec * 1000))
+    return struct.pack("<4sBIBI", b"META", 4, pos_ms, 1 if playing else 0, timestamp_ms & 0xFFFFFFFF)
+
+POWER_LEVELS = {"awake": 0, "dim": 1, "sleep": 2}
+
+def pack_power(level: int) -> bytes:
+    """
+    META(type=5): <4s B B>
+      magic="META", type=5, level (0=awake, 1=dim, 2=sleep)
+    """
+    return struct.pack("<4sBB", b"META", 5, max(0, min(2, int(level))))
+
+def _send_once(port: str, data: bytes, baud=921600):
     with serial.Serial(port, baudrate=baud, timeout=5) as ser:
-        ser.write(header)
+        ser.write(data)
         ser.flush()
 
+def send_meta(port: str, title: str, artist: str, duration_sec: int, baud=921600):
+    _send_once(port, pack_meta(title, artist, duration_sec), baud)
+
+def send_pos(port: str, position_sec: int, baud=921600):
+    _send_once(port, pack_pos(position_sec), baud)
+
+def send_volume(port: str, volume_pct: int, baud=921600):
+    _send_once(port, pack_volume(volume_pct), baud)
+
+def send_state(port: str, position_sec: float, playing: bool, baud=921600):
+    _send_once(port, pack_state(position_sec, playing), baud)
+
+def send_power(port: str, level: int, baud=921600):
+    _send_once(port, pack_power(level), baud)
+
+# ----------------------
+# Long-lived link: one open port, frames written from a queue
+# ----------------------
+
+def _port_ident(port):
+    try:
+        st = os.stat(port)
+    except OSError:
+        return None
+    return (st.st_rdev, st.st_ino)
+
+def find_m5_port(preferred: str = None, usb_id: str = None, serial_number: str = None):
+    """
+    `preferred` if it exists (best a /dev/serial/by-id/... path, which comes
+    back under the same name after a replug). Otherwise the port whose USB
+    "vid:pid" is `usb_id` and, if given, whose serial number matches.
+    Never guesses by vendor alone: CH34x/CP210x bridges are on plenty of
+    other devices we must not stream frames into.
+    """
+    if preferred and os.path.exists(preferred):
+        return preferred
+    if not usb_id:
+        return None
+    vid, pid = (int(x, 16) for x in usb_id.split(":"))
+    for info in list_ports.comports():
+        if info.vid == vid and info.pid == pid and (serial_number is None or info.serial_number == serial_number):
+            return info.device
+    return None
+
+class SerialLink:
+    """
+    Keeps one serial.Serial handle open and writes frames from a background
+    thread. Safe to call from any thread. If the port goes away (USB reset,
+    unplug) the handle is dropped and reopened on the next frame.
+
+    on_open() is called after every successful (re)open, since whatever was
+    on the M5 before may be gone; present() tells whether the device node
+    we opened is still there (a re-enumerated port is a new node).
+    """
+    def __init__(self, port: str, baud=921600, timeout=5, reopen_delay=1.0, cache: CoverCache = None,
+                 on_open=None):
+        self.port = port
+        self.cache = cache
+        self.baud = baud
+        self.timeout = timeout
+        self.reopen_delay = reopen_delay
+        self.on_open = on_open
+        self.ser = None
+        self.ident = None   # (st_rdev, st_ino) of the node we opened
+        self.lock = threading.Lock()  # guards ser between the writer and reopen()
+        self.running = True
+        self._queue = queue.Queue()
+        self._last_fail = 0.0
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        if self.ser is not None:
+            return True
+        if time.monotonic() - self._last_fail < self.reopen_delay:
+            return False
+        try:
+            self.ser = serial.Serial(self.port, baudrate=self.baud, timeout=self.timeout)
+            self.ident = _port_ident(self.port)
+        except (serial.SerialException, OSError) as e:
+            print(f"[SerialLink] Can't open {self.port}: {e}")
+            self._last_fail = time.monotonic()
+            return False
+        if self.on_open is not None:
+            try:
+                self.on_open()
+            except Exception as e:
+                print(f"[SerialLink] on_open failed: {e}")
+        return True
+
+    def _drop(self):
+        try:
+            if self.ser is not None:
+                self.ser.close()
+        except Exception:
+            pass
+        self.ser = None
+        self._last_fail = time.monotonic()
+
+    def _writer(self):
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    break
+                with self.lock:
+                    if not self._open():
+                        continue  # device missing, drop this frame
+                    try:
+                        self.ser.write(data)
+                        self.ser.flush()
+                    except (serial.SerialException, OSError) as e:
+                        print(f"[SerialLink] Write failed on {self.port}: {e}")
+                        self._drop()
+            finally:
+                self._queue.task_done()
+
+    def present(self):
+        """True while the port we opened is still the same device node."""
+        return self.ser is not None and _port_ident(self.port) == self.ident
+
+    def reopen(self, port: str = None):
+        """Close and open `port` (default: the current one) now; True if it opened."""
+        with self.lock:
+            self._drop()
+            if port is not None:
+                self.port = port
+            self._last_fail = 0.0
+            return self._open()
+
+    def drain(self, timeout=5.0):
+        """Wait until every queued frame has been written (or dropped)."""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(left)
+        return True
+
+    def write(self, data: bytes):
+        if self.running:
+            self._queue.put(data)
+
+    def send_frame(self, fmt: int, w: int, h: int, payload: bytes):
+        self.write(pack_frame(fmt, w, h, payload))
+
+    def send_jpeg(self, url: str, target=(320,240), quality=85, max_bytes: int = None, max_ms: float = None):
+        max_bytes = resolve_budget(max_bytes, max_ms, self.baud)
+        jpg = encode_cover(url, 1, target, quality, self.cache, max_bytes=max_bytes)
+        self.send_frame(1, target[0], target[1], jpg)
+
+    def send_rgb565(self, url: str, target=(320,240)):
+        rgb565 = encode_cover(url, 2, target, cache=self.cache)
+        self.send_frame(2, target[0], target[1], rgb565)
+
+    def send_rle565(self, url: str, target=(320,240)):
+        rle = encode_cover(url, 3, target, cache=self.cache)
+        self.send_frame(3, target[0], target[1], rle)
+
+    def send_meta(self, title: str, artist: str, duration_sec: int):
+        self.write(pack_meta(title, artist, duration_sec))
+
+    def send_pos(self, position_sec: int):
+        self.write(pack_pos(position_sec))
+
+    def send_volume(self, volume_pct: int):
+        self.write(pack_volume(volume_pct))
+
+    def send_state(self, position_sec: float, playing: bool):
+        self.write(pack_state(position_sec, playing))
+
+    def send_power(self, level: int):
+        self.write(pack_power(level))
+
+    def close(self):
+        self.running = False
+        self._queue.put(None)
+        self._thread.join(timeout=self.timeout)
+        self._drop()
+
+
+class CoverWorker:
+    """
+    Fetches/fits/encodes covers on a background thread so the caller's loop
+    never waits on the network. Latest wins: submitting a new URL while an
+    older one is still in flight makes the older result get dropped.
+
+    on_done(url, payload) is called from the worker thread when a cover is
+    ready; by default the frame is queued on `link`.
+    """
+    def __init__(self, link: SerialLink, fmt=1, target=(320,240), quality=85, on_done=None,
+                 max_bytes: int = None):
+        self.link = link
+        self.fmt = fmt
+        self.target = target
+        self.quality = quality
+        self.max_bytes = max_bytes  # JPEG budget, see encode_jpeg_budget
+        self.on_done = on_done or self._send
+        self.running = True
+        self._cond = threading.Condition()
+        self._seq = 0       # bumped on every submit
+        self._url = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, url: str):
+        with self._cond:
+            self._seq += 1
+            self._url = url
+            self._cond.notify()
+
+    def _stale(self, seq):
+        return seq != self._seq or not self.running
+
+    def _send(self, url, payload):
+        self.link.send_frame(self.fmt, self.target[0], self.target[1], payload)
+
+    def _run(self):
+        done_seq = 0
+        while True:
+            with self._cond:
+                while self.running and self._seq == done_seq:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                seq, url = self._seq, self._url
+            done_seq = seq
+            if not url:
+                continue
+            try:
+                payload = encode_cover(url, self.fmt, self.target, self.quality, self.link.cache,
+                                       max_bytes=self.max_bytes)
+            except Exception as e:
+                print(f"[CoverWorker] Failed to load cover '{url}': {e}")
+                continue
+            if self._stale(seq):
+                continue  # track changed while we were fetching
+            try:
+                self.on_done(url, payload)
+            except Exception as e:
+                print(f"[CoverWorker] on_done failed: {e}")
+
+    def close(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self._thread.join(timeout=1)
+
 
 def main():
     p = argparse.ArgumentParser(description="Send album cover and/or metadata/progress over Serial")
@@ -101,12 +574,23 @@ def main():
     sp_img.add_argument("--w", type=int, default=320)
     sp_img.add_argument("--h", type=int, default=240)
     sp_img.add_argument("--quality", type=int, default=85)
+    sp_img.add_argument("--max-bytes", type=int, help="Payload budget; lowers quality/subsampling to fit")
+    sp_img.add_argument("--max-ms", type=float, help="Transfer-time budget at 921600 baud")
+    sp_img.add_argument("--cache", help="Cover cache directory")
 
     sp_rgb = sub.add_parser("rgb", help="Send fitted RGB565")
     sp_rgb.add_argument("port")
     sp_rgb.add_argument("url")
     sp_rgb.add_argument("--w", type=int, default=320)
     sp_rgb.add_argument("--h", type=int, default=240)
+    sp_rgb.add_argument("--cache", help="Cover cache directory")
+
+    sp_rle = sub.add_parser("rle", help="Send fitted RLE-compressed RGB565")
+    sp_rle.add_argument("port")
+    sp_rle.add_argument("url")
+    sp_rle.add_argument("--w", type=int, default=320)
+    sp_rle.add_argument("--h", type=int, default=240)
+    sp_rle.add_argument("--cache", help="Cover cache directory")
 
     # send meta (title/artist/duration)
     sp_meta = sub.add_parser("meta", help="Send title/artist/duration")
@@ -120,29 +604,52 @@ def main():
     sp_pos.add_argument("port")
     sp_pos.add_argument("--pos", required=True, type=int, help="Position in seconds")
 
+    # send playback state (M5 interpolates position locally)
+    sp_state = sub.add_parser("state", help="Send position + playing/paused state")
+    sp_state.add_argument("port")
+    sp_state.add_argument("--pos", required=True, type=float, help="Position in seconds")
+    sp_state.add_argument("--paused", action="store_true", help="Playback is paused")
+
     # send volume %
     sp_vol = sub.add_parser("vol", help="Send volume percentage (0-100)")
     sp_vol.add_argument("port")
     sp_vol.add_argument("--vol", required=True, type=int, help="Volume percent (0..100)")
 
+    # wake/dim/sleep the display
+    sp_power = sub.add_parser("power", help="Set display power")
+    sp_power.add_argument("port")
+    sp_power.add_argument("level", choices=("awake", "dim", "sleep"))
+
 
     args = p.parse_args()
 
+    cache = CoverCache(args.cache) if getattr(args, "cache", None) else None
+
     if args.cmd == "jpeg":
-        send_jpeg(args.url, args.port, target=(args.w, args.h), quality=args.quality)
+        send_jpeg(args.url, args.port, target=(args.w, args.h), quality=args.quality, cache=cache,
+                  max_bytes=args.max_bytes, max_ms=args.max_ms)
         print("Sent JPEG")
     elif args.cmd == "rgb":
-        send_rgb565(args.url, args.port, target=(args.w, args.h))
+        send_rgb565(args.url, args.port, target=(args.w, args.h), cache=cache)
         print("Sent RGB565")
+    elif args.cmd == "rle":
+        send_rle565(args.url, args.port, target=(args.w, args.h), cache=cache)
+        print("Sent RLE565")
     elif args.cmd == "meta":
         send_meta(args.port, args.title, args.artist, args.duration)
         print("Sent META")
     elif args.cmd == "pos":
         send_pos(args.port, args.pos)
         print("Sent position")
+    elif args.cmd == "state":
+        send_state(args.port, args.pos, not args.paused)
+        print("Sent state")
     elif args.cmd == "vol":
         send_volume(args.port, args.vol)
         print("Sent volume")
+    elif args.cmd == "power":
+        send_power(args.port, POWER_LEVELS[args.level])
+        print("Sent power")
 
 
 if __name__ == "__main__":
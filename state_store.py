@@ -0,0 +1,43 @@
+import threading
+
+
+class StateStore:
+    """
+    Small observable key/value store shared by everything in one process.
+
+    set(**fields) only notifies when a value actually changes; subscribers
+    get the set of changed field names and can read the rest with get().
+    Callbacks run on the thread that called set().
+    """
+    def __init__(self, **initial):
+        self.lock = threading.Lock()
+        self.values = dict(initial)
+        self.subscribers = []  # (frozenset of fields or None for all, callback)
+
+    def get(self, name, default=None):
+        with self.lock:
+            return self.values.get(name, default)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def set(self, **fields):
+        with self.lock:
+            changed = {k for k, v in fields.items() if self.values.get(k, object()) != v}
+            self.values.update(fields)
+            subs = list(self.subscribers)
+        if not changed:
+            return changed
+        for watch, callback in subs:
+            if watch is None or watch & changed:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    print(f"[StateStore] subscriber failed: {e}")
+        return changed
+
+    def subscribe(self, callback, fields=None):
+        """callback(changed_fields) when any of `fields` (default: any field) changes."""
+        with self.lock:
+            self.subscribers.append((frozenset(fields) if fields else None, callback))
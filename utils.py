@@ -1,4 +1,4 @@
-import subprocess, shlex, re
+import subprocess, shlex, re, json, os, time
 
 
 def execute(command: str, volume=False):
@@ -9,3 +9,16 @@ def execute(command: str, volume=False):
         m = re.search(r"(\d{1,3})%", r.stdout)
         return int(m.group(1)) if m else None
     return subprocess.run(shlex.split(command), capture_output=True, text=True)
+
+
+def write_json(path, metrics):
+    """Atomically replace `path` with {"time": now, "metrics": metrics}."""
+    path = str(path)
+    tmp = path + ".tmp"
+    data = {"time": time.time(), "metrics": metrics}
+    try:
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[utils] Failed to write {path}: {e}")